@@ -0,0 +1,102 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate
+from utils.data import apply_schema, load_deaths, load_gdp, load_gdp2, USEFUL_COLUMNS, _NUMERIC_COLUMNS, _get_deaths_by_cases
+
+
+def _legacy_load_deaths(path: str, *, gdp: pd.DataFrame, gdp2: pd.DataFrame, years: list) -> pd.DataFrame:
+    # Row-wise pipeline that load_deaths used before vectorization, kept as the reference.
+    # The gdp2 fallback is keyed by iso_code here, matching the fixed join in load_deaths.
+    max_year = max(map(int, years))
+    deaths = pd.read_csv(path)
+    deaths[_NUMERIC_COLUMNS] = deaths[_NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    deaths.date = pd.to_datetime(deaths.date)
+    deaths = deaths.loc[deaths.iso_code.apply(lambda x: "OWID" not in x)]
+    deaths = deaths.loc[~deaths[_NUMERIC_COLUMNS].isna().all(axis=1), USEFUL_COLUMNS]
+    deaths = deaths.loc[deaths.date.apply(lambda x: x.year < (max_year + 1))]
+
+    deaths["year"] = deaths.date.apply(lambda x: x.year)
+    deaths["month"] = deaths.date.apply(lambda x: x.month)
+    deaths["day"] = deaths.date.apply(lambda x: x.day)
+    deaths["deaths_by_cases"] = _get_deaths_by_cases(deaths[["total_deaths", "total_cases"]])
+
+    locations = {}
+    unique_names = gdp2.Country.unique()
+    for location in deaths.iso_code.unique():
+        if location in gdp["Country Code"].unique():
+            locations[location] = gdp.loc[gdp["Country Code"] == location, years].to_dict()
+        else:
+            name = deaths.loc[deaths.iso_code == location].location.values[0]
+            for country in unique_names:
+                if isinstance(country, float):
+                    continue
+                if name in country:
+                    locations[location] = gdp2.loc[gdp2.Country == country, years].to_dict()
+                    break
+    for location in locations.keys():
+        locations[location] = {k: list(v.values())[0] for k, v in locations[location].items()}
+
+    gpd_dataframe = pd.DataFrame(locations).T.reset_index()
+    deaths = deaths.merge(gpd_dataframe, left_on="iso_code", right_on="index")
+    deaths = deaths.drop("index", axis=1)
+    deaths["gdp"] = deaths.apply(lambda row: row[str(row.date.year)], axis=1)
+    deaths = deaths.drop(years, axis=1)
+    deaths = deaths.loc[deaths.gdp != ".."]
+    deaths["gdp"] = pd.to_numeric(deaths['gdp'], errors='coerce')
+    return deaths
+
+
+def _timed(function, repeat: int) -> tuple:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare load_deaths with the row-wise reference pipeline.")
+    parser.add_argument("--rows", type=int, default=350_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--engine", choices=("c", "pyarrow"), default="c")
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="covid-bench-")
+    paths = generate(data_dir, args.rows)
+    years = ["2020", "2021", "2022"]
+    gdp = load_gdp(paths["gdp_filename"])
+    gdp2 = load_gdp2(paths["gdp2_filename"])
+
+    legacy_time, legacy = _timed(
+        lambda: _legacy_load_deaths(paths["deaths_filename"], gdp=gdp, gdp2=gdp2, years=years), args.repeat
+    )
+    current_time, current = _timed(
+        lambda: load_deaths(
+            paths["deaths_filename"], gdp=gdp, gdp2=gdp2, years=years, engine=args.engine, chunk_rows=args.chunk_rows
+        ),
+        args.repeat
+    )
+    pd.testing.assert_frame_equal(apply_schema(legacy), current, check_exact=args.engine == "c", rtol=1e-12)
+
+    print(f"rows in file:       {args.rows}")
+    print(f"rows loaded:        {current.shape[0]}")
+    print(f"row-wise pipeline:  {legacy_time:.3f}s")
+    print(f"load_deaths:        {current_time:.3f}s")
+    print(f"speedup:            {legacy_time / current_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from benchmarks.load import _timed
+from benchmarks.synthetic import generate
+
+_STARTUP_SCRIPT = (
+    "import time; start = time.perf_counter(); import main; main.load_dataset(); print(time.perf_counter() - start)"
+)
+_SELECTIVITIES = (0.01, 0.1, 0.5, 1.0)
+_FORMATS = ("arrow", "parquet", "split", "ndjson")
+_ITEM = {
+    "iso_code": "BNC",
+    "continent": "Europe",
+    "location": "Benchmark",
+    "date": "2022-06-01T00:00:00",
+    "day": 1,
+    "month": 6,
+    "year": 2022,
+    "deaths_by_cases": 0.01,
+    "population": 1_000_000,
+    "total_cases": 1000,
+    "new_cases": 10,
+    "total_deaths": 10,
+    "new_deaths": 1,
+    "total_deaths_per_million": 10.0,
+    "total_cases_per_million": 1000.0,
+}
+
+
+def _data_paths(data_dir: str, rows: int) -> dict:
+    directory = os.path.join(data_dir, str(rows))
+    paths = {
+        "deaths_filename": os.path.join(directory, "CovidDeaths.csv"),
+        "gdp_filename": os.path.join(directory, "GDP.csv"),
+        "gdp2_filename": os.path.join(directory, "GDP-by-Country.csv"),
+    }
+    if not all(os.path.exists(path) for path in paths.values()):
+        paths = generate(directory, rows)
+    return paths
+
+
+def _environment(paths: dict, work_dir: str) -> dict:
+    return {
+        **os.environ,
+        **paths,
+        "cache_dir": os.path.join(work_dir, "cache"),
+        "wal_dir": os.path.join(work_dir, "wal"),
+        "wal_tail_interval": "0",
+        "reload_interval": "0",
+        "hypothesis_workers": "0",
+    }
+
+
+def _startup(env: dict, *, cold: bool) -> float:
+    if cold:
+        shutil.rmtree(env["cache_dir"], ignore_errors=True)
+    shutil.rmtree(env["wal_dir"], ignore_errors=True)
+    output = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT], cwd=API_DIR, env=env, check=True, capture_output=True, text=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def _startup_timings(env: dict, repeat: int) -> dict:
+    cold = sorted(_startup(env, cold=True) for _ in range(repeat))
+    warm = sorted(_startup(env, cold=False) for _ in range(repeat))
+    return {"startup_cold": cold[len(cold) // 2], "startup_warm": warm[len(warm) // 2]}
+
+
+def _endpoint_timings(repeat: int, posts: int, formats: list) -> dict:
+    import main
+    from fastapi.testclient import TestClient
+    from utils.data import _get_nans_stats
+
+    results = {}
+    with TestClient(main.app) as client:
+        if not main.readiness.wait(timeout=3600):
+            raise RuntimeError("The dataset did not load in time")
+        dates = main.deaths.frame.date
+        first, last = dates.min(), dates.max()
+        for selectivity in _SELECTIVITIES:
+            end = first + (last - first) * selectivity
+            results[f"query_{selectivity:g}"], _ = _timed(lambda: main.deaths.window(first, end), repeat)
+
+        params = {"start_datetime": first.isoformat(), "end_datetime": last.isoformat()}
+        for data_format in formats:
+            def fetch():
+                main.responses.clear()
+                response = client.get("/api/v1/data", params={**params, "format": data_format})
+                response.raise_for_status()
+                return response.content
+            results[f"serialize_{data_format}"], _ = _timed(fetch, repeat)
+
+        for name, path in (("bar_data", "/api/v1/nans-counts"), ("pies_data", "/api/v1/get-pies-data")):
+            def cold():
+                _get_nans_stats.cache_clear()
+                return client.get(path).raise_for_status()
+            results[f"{name}_cold"], _ = _timed(cold, repeat)
+            results[f"{name}_warm"], _ = _timed(lambda: client.get(path).raise_for_status(), repeat)
+
+        start = time.perf_counter()
+        for _ in range(posts):
+            client.post("/api/v1/data", json=_ITEM).raise_for_status()
+        results["post_data_per_request"] = (time.perf_counter() - start) / posts
+    return results
+
+
+def _run(rows: int, args) -> dict:
+    paths = _data_paths(args.data_dir, rows)
+    work_dir = tempfile.mkdtemp(prefix="covid-bench-work-")
+    try:
+        env = _environment(paths, work_dir)
+        results = _startup_timings(env, args.repeat)
+        output = os.path.join(work_dir, "endpoints.json")
+        subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__),
+                "--endpoints", output,
+                "--repeat", str(args.repeat),
+                "--posts", str(args.posts),
+                "--formats", *args.formats,
+            ],
+            cwd=API_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(output) as file:
+            results.update(json.load(file))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, *, threshold: float, min_delta: float) -> list:
+    regressions = []
+    for rows, timings in results.items():
+        for name, value in timings.items():
+            previous = baseline.get(rows, {}).get(name)
+            if previous is None:
+                continue
+            if value > previous * (1 + threshold) and value - previous > min_delta:
+                regressions.append((rows, name, previous, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time startup, queries, serialization and ingest of the API.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--formats", nargs="+", default=list(_FORMATS))
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "covid-bench-data"))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--min-delta", type=float, default=0.005)
+    parser.add_argument("--endpoints", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.endpoints is not None:
+        with open(args.endpoints, "w") as file:
+            json.dump(_endpoint_timings(args.repeat, args.posts, args.formats), file)
+        return
+
+    results = {}
+    for rows in args.rows:
+        results[str(rows)] = _run(rows, args)
+        for name, value in results[str(rows)].items():
+            print(f"{rows:>10} {name:<28}{value:.4f}s")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "posts": args.posts,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, threshold=args.threshold, min_delta=args.min_delta)
+        for rows, name, previous, value in regressions:
+            print(f"regression: {rows} {name} {previous:.4f}s -> {value:.4f}s ({value / previous - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+__all__ = ("generate",)
+
+_START_DATE = "2020-01-01"
+_MAX_DAYS = 1700
+_CHUNK_ROWS = 500_000
+_CONTINENTS = ["Asia", "Europe", "Africa", "Oceania", "North America", "South America"]
+_EXTRA_COLUMNS = [
+    "new_cases_smoothed", "new_deaths_smoothed", "new_cases_smoothed_per_million",
+    "new_deaths_per_million", "new_deaths_smoothed_per_million", "reproduction_rate",
+    "icu_patients", "icu_patients_per_million", "hosp_patients", "hosp_patients_per_million",
+    "weekly_icu_admissions", "weekly_icu_admissions_per_million", "weekly_hosp_admissions",
+    "weekly_hosp_admissions_per_million", "total_tests", "new_tests", "total_tests_per_thousand",
+    "new_tests_per_thousand", "new_tests_smoothed", "new_tests_smoothed_per_thousand",
+    "positive_rate", "tests_per_case", "total_vaccinations", "people_vaccinated",
+    "people_fully_vaccinated", "total_boosters", "new_vaccinations", "new_vaccinations_smoothed",
+    "total_vaccinations_per_hundred", "people_vaccinated_per_hundred",
+    "people_fully_vaccinated_per_hundred", "total_boosters_per_hundred",
+    "new_vaccinations_smoothed_per_million", "new_people_vaccinated_smoothed",
+    "new_people_vaccinated_smoothed_per_hundred", "stringency_index", "population_density",
+    "median_age", "aged_65_older", "aged_70_older", "gdp_per_capita", "extreme_poverty",
+    "cardiovasc_death_rate", "diabetes_prevalence", "female_smokers", "male_smokers",
+    "handwashing_facilities", "hospital_beds_per_thousand", "life_expectancy",
+    "human_development_index", "population", "excess_mortality_cumulative_absolute",
+    "excess_mortality_cumulative", "excess_mortality", "excess_mortality_cumulative_per_million",
+]
+_GDP_YEARS = {
+    "1990 [YR1990]": 1990,
+    "2000 [YR2000]": 2000,
+    "2014 [YR2010]": 2010,
+    "2015 [YR2015]": 2015,
+    "2016 [YR2016]": 2016,
+    "2017 [YR2017]": 2017,
+    "2018 [YR2018]": 2018,
+    "2019 [YR2019]": 2019,
+    "2020 [YR2020]": 2020,
+    "2021 [YR2021]": 2021,
+    "2022 [YR2022]": 2022,
+    "2023 [YR2023]": 2023,
+}
+
+
+def _iso_codes(count: int) -> list:
+    letters = string.ascii_uppercase
+    return [
+        letters[i // 676 % 26] + letters[i // 26 % 26] + letters[i % 26]
+        for i in range(count)
+    ]
+
+
+def _with_nans(rng: np.random.Generator, values: np.ndarray, ratio: float) -> np.ndarray:
+    values = values.astype("float64")
+    values[rng.random(values.shape[0]) < ratio] = np.nan
+    return values
+
+
+def _layout(rng: np.random.Generator, rows: int) -> tuple:
+    days = min(_MAX_DAYS, max(30, rows // 8))
+    countries = -(-rows // days)
+    aggregates = max(1, countries // 20)
+    isos = _iso_codes(countries - aggregates) + [f"OWID_{code}" for code in _iso_codes(aggregates)]
+    names = [f"Country {iso}" for iso in isos]
+    continents = rng.choice(_CONTINENTS, size=countries).astype(object)
+    continents[countries - aggregates:] = np.nan
+    population = rng.integers(10 ** 5, 10 ** 9, size=countries).astype("float64")
+    return days, aggregates, isos, names, continents, population
+
+
+def _deaths_chunk(rng: np.random.Generator, countries: np.ndarray, days: int, rows: int, layout: tuple) -> pd.DataFrame:
+    _, _, isos, names, continents, population = layout
+    country_index = np.repeat(countries, days)
+    day_index = np.tile(np.arange(days), countries.shape[0])
+    keep = country_index * days + day_index < rows
+    country_index, day_index = country_index[keep], day_index[keep]
+    size = country_index.shape[0]
+    dates = pd.Timestamp(_START_DATE) + pd.to_timedelta(day_index, unit="D")
+    population = population[country_index]
+
+    new_cases = rng.poisson(50, size=size).astype("float64")
+    new_deaths = rng.poisson(2, size=size).astype("float64")
+    new_cases[day_index < 5] = 0
+    total_cases = pd.Series(new_cases).groupby(country_index).cumsum().to_numpy()
+    total_deaths = pd.Series(new_deaths).groupby(country_index).cumsum().to_numpy()
+
+    frame = pd.DataFrame({
+        "iso_code": np.asarray(isos, dtype=object)[country_index],
+        "continent": continents[country_index],
+        "location": np.asarray(names, dtype=object)[country_index],
+        "date": dates.strftime("%Y-%m-%d"),
+        "total_cases": _with_nans(rng, total_cases, 0.05),
+        "new_cases": _with_nans(rng, new_cases, 0.1),
+        "total_deaths": _with_nans(rng, total_deaths, 0.05),
+        "new_deaths": _with_nans(rng, new_deaths, 0.1),
+        "total_cases_per_million": _with_nans(rng, total_cases / population * 10 ** 6, 0.05),
+        "new_cases_per_million": _with_nans(rng, new_cases / population * 10 ** 6, 0.1),
+        "total_deaths_per_million": _with_nans(rng, total_deaths / population * 10 ** 6, 0.05),
+    })
+    all_nans = rng.random(size) < 0.03
+    frame.loc[all_nans, [
+        "total_cases", "new_cases", "total_deaths", "new_deaths",
+        "total_cases_per_million", "new_cases_per_million", "total_deaths_per_million"
+    ]] = np.nan
+    for column in _EXTRA_COLUMNS:
+        frame[column] = _with_nans(rng, (rng.random(size) * 100).round(2), 0.5)
+    return frame
+
+
+def _write_deaths(rng: np.random.Generator, path: str, rows: int) -> tuple:
+    layout = _layout(rng, rows)
+    days, aggregates, isos, names = layout[:4]
+    countries = np.arange(len(isos))
+    step = max(1, _CHUNK_ROWS // days)
+    for first in range(0, countries.shape[0], step):
+        chunk = _deaths_chunk(rng, countries[first:first + step], days, rows, layout)
+        chunk.to_csv(path, index=False, mode="w" if first == 0 else "a", header=first == 0)
+    return isos[:len(isos) - aggregates], names[:len(names) - aggregates]
+
+
+def _gdp_frames(rng: np.random.Generator, isos: list, names: list) -> tuple:
+    covered = rng.random(len(isos)) < 0.85
+    gdp = pd.DataFrame({
+        "Country Name": np.asarray(names, dtype=object)[covered],
+        "Country Code": np.asarray(isos, dtype=object)[covered],
+        "Series Name": "GDP (current US$)",
+        "Series Code": "NY.GDP.MKTP.CD",
+    })
+    for column in _GDP_YEARS:
+        values = (rng.random(gdp.shape[0]) * 10 ** 12).round(2).astype(str).astype(object)
+        values[rng.random(gdp.shape[0]) < 0.05] = ".."
+        gdp[column] = values
+
+    fallback = np.asarray(names, dtype=object)[~covered]
+    gdp2 = pd.DataFrame({"Country": [f"{name}, Rep." for name in fallback]})
+    for year in range(1999, 2023):
+        gdp2[str(year)] = (rng.random(gdp2.shape[0]) * 10 ** 3).round(3)
+    return gdp, gdp2
+
+
+def generate(directory: str, rows: int, *, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "deaths_filename": os.path.join(directory, "CovidDeaths.csv"),
+        "gdp_filename": os.path.join(directory, "GDP.csv"),
+        "gdp2_filename": os.path.join(directory, "GDP-by-Country.csv"),
+    }
+    isos, names = _write_deaths(rng, paths["deaths_filename"], rows)
+    gdp, gdp2 = _gdp_frames(rng, isos, names)
+    gdp.to_csv(paths["gdp_filename"], index=False)
+    gdp2.to_csv(paths["gdp2_filename"], index=False)
+    return paths
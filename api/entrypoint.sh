@@ -1 +1 @@
-fastapi run main.py --port=1234 --host=0.0.0.0
\ No newline at end of file
+fastapi run main.py --port=1234 --host=0.0.0.0 --workers=${workers:-1}
\ No newline at end of file
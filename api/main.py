@@ -1,13 +1,35 @@
 import os
 import fastapi
+import threading
+import multiprocessing
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from pydantic import BaseModel
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated
 
 from utils.data import *
-
-app = fastapi.FastAPI()
+from utils.cache import load_deaths_cached
+from utils.store import DeathsStore, derive_generation
+from utils.serialization import *
+from utils.wal import WriteAheadLog
+from utils.memo import VersionedCache
+from utils.aggregate import aggregate, correlations, describe
+from utils.rollup import CUBES, RollupCubes
+from utils.reload import FileWatcher
+from utils.etag import encoded_etag, etag_matches, file_etag, variant_etag
+from utils.query import parse_cursor, select_rows
+from utils.country import CountryIndex
+from utils.snapshot import LatestObservations
+from utils.hypothesis import run_hypothesis
+from utils.metrics import span, render_metrics
+from utils.instrumentation import InstrumentedRoute, MetricsMiddleware
+from utils.response_cache import ResponseCache, negotiate_encoding
+from utils.readiness import Readiness
 
 if not os.path.exists(os.environ.get("deaths_filename", "")):
     raise Exception("Deaths file not found")
@@ -16,18 +38,144 @@ if not os.path.exists(os.environ.get("gdp_filename", "")):
 if not os.path.exists(os.environ.get("gdp2_filename", "")):
     raise Exception("GDP2 file not found")
 
-gdp = load_gdp(os.environ["gdp_filename"])
-gdp2 = pd.read_csv(os.environ["gdp2_filename"])
-deaths = load_deaths(
-    os.environ["deaths_filename"],
-    gdp=gdp,
-    gdp2=gdp2,
-    years=[
-        "2020",
-        "2021",
-        "2022",
-    ]
+YEARS = ["2020", "2021", "2022"]
+CSV_OPTIONS = {
+    "engine": os.environ.get("csv_engine", "c"),
+    "chunk_rows": int(os.environ.get("csv_chunk_rows", "0")) or None,
+}
+write_lock = threading.Lock()
+Count = Annotated[int, Field(ge=-2 ** 31, le=2 ** 31 - 1)]
+
+
+def load_base() -> pd.DataFrame:
+    return load_deaths_cached(
+        os.environ.get("cache_dir", "./cache"),
+        os.environ["deaths_filename"],
+        gdp_path=os.environ["gdp_filename"],
+        gdp2_path=os.environ["gdp2_filename"],
+        years=YEARS,
+        mmap=True,
+        **CSV_OPTIONS
+    )
+
+
+def reload_sources(changes: dict) -> None:
+    global deaths, rollups, latest, countries, gdp_unmatched
+    offset = changes.get(os.environ["deaths_filename"])
+    if offset is not None and len(changes) == 1:
+        deaths.extend(load_deaths(
+            os.environ["deaths_filename"],
+            gdp=load_gdp(os.environ["gdp_filename"], engine=CSV_OPTIONS["engine"]),
+            gdp2=load_gdp2(os.environ["gdp2_filename"], engine=CSV_OPTIONS["engine"]),
+            years=YEARS,
+            offset=offset,
+            **CSV_OPTIONS
+        ))
+        return
+
+    base = load_base()
+    cubes = RollupCubes(base)
+    observations = LatestObservations(base)
+    index = CountryIndex(base)
+    with write_lock:
+        replayed = wal.replay() if wal is not None else pd.DataFrame()
+        store = DeathsStore(
+            base,
+            version=deaths.version + 1,
+            generation=derive_generation(base.attrs.get("fingerprint"), replayed.shape[0])
+        )
+        store.add_listener(cubes.update)
+        store.add_listener(observations.update)
+        store.add_listener(index.update)
+        store.extend(replayed)
+        deaths, rollups, latest, countries = store, cubes, observations, index
+        gdp_unmatched = base.attrs.get("gdp_unmatched", {})
+
+
+def load_dataset() -> None:
+    global deaths, rollups, latest, countries, gdp_unmatched, wal, watcher
+    with readiness.stage("sources"):
+        base = load_base()
+    with readiness.stage("rollups"):
+        cubes = RollupCubes(base)
+    with readiness.stage("snapshot"):
+        observations = LatestObservations(base)
+        index = CountryIndex(base)
+    with readiness.stage("wal"):
+        log, replayed = None, pd.DataFrame()
+        if os.environ.get("wal_dir", "./wal"):
+            log = WriteAheadLog(
+                os.environ.get("wal_dir", "./wal"),
+                fsync_interval=float(os.environ.get("wal_fsync_interval", "1.0")),
+                fold_delay=float(os.environ.get("wal_fold_delay", "30.0"))
+            )
+            replayed = log.replay()
+        store = DeathsStore(base, generation=derive_generation(base.attrs.get("fingerprint"), replayed.shape[0]))
+        store.add_listener(cubes.update)
+        store.add_listener(observations.update)
+        store.add_listener(index.update)
+        store.extend(replayed)
+    with write_lock:
+        deaths, rollups, latest, countries, wal = store, cubes, observations, index, log
+        gdp_unmatched = base.attrs.get("gdp_unmatched", {})
+    del base
+
+    if wal is not None:
+        if float(os.environ.get("wal_tail_interval", "0.5")) > 0:
+            wal.follow(
+                lambda rows: deaths.append(deaths.prepare(rows.to_dict("records"), skip_invalid=True)),
+                interval=float(os.environ.get("wal_tail_interval", "0.5")),
+                lock=write_lock
+            )
+        threading.Thread(target=wal.compact, name="wal-compaction", daemon=True).start()
+    if float(os.environ.get("reload_interval", "5.0")) > 0:
+        watcher = FileWatcher(
+            [os.environ["deaths_filename"], os.environ["gdp_filename"], os.environ["gdp2_filename"]],
+            reload_sources,
+            interval=float(os.environ.get("reload_interval", "5.0"))
+        )
+        watcher.start()
+
+
+deaths = rollups = latest = countries = wal = watcher = None
+gdp_unmatched = {}
+readiness = Readiness(("sources", "rollups", "snapshot", "wal"))
+retry_after = os.environ.get("retry_after", "5")
+
+aggregates = VersionedCache()
+hypotheses = VersionedCache(maxsize=16)
+responses = ResponseCache(
+    max_bytes=int(os.environ.get("response_cache_bytes", str(256 << 20))),
+    max_entry_bytes=int(os.environ.get("response_cache_entry_bytes", "0")) or None
 )
+hypothesis_workers = int(os.environ.get("hypothesis_workers", "0"))
+hypothesis_pool = None
+
+
+@asynccontextmanager
+async def lifespan(_: fastapi.FastAPI):
+    global hypothesis_pool
+    if hypothesis_workers > 0:
+        hypothesis_pool = ProcessPoolExecutor(hypothesis_workers, mp_context=multiprocessing.get_context("spawn"))
+    readiness.start(load_dataset)
+    yield
+    if watcher is not None:
+        watcher.close()
+    if wal is not None:
+        wal.close()
+    if hypothesis_pool is not None:
+        hypothesis_pool.shutdown()
+        hypothesis_pool = None
+
+
+def require_dataset(request: fastapi.Request):
+    if request.url.path.startswith("/api/") and not readiness.ready:
+        raise fastapi.HTTPException(status_code=503, detail=readiness.status(), headers={"Retry-After": retry_after})
+
+
+app = fastapi.FastAPI(lifespan=lifespan, dependencies=[fastapi.Depends(require_dataset)])
+app.router.route_class = InstrumentedRoute
+app.add_middleware(MetricsMiddleware, profile_dir=os.environ.get("profile_dir") or None)
 
 
 class Item(BaseModel):
@@ -35,50 +183,380 @@ class Item(BaseModel):
     continent: str
     location: str
     date: datetime
-    day: int
-    month: int
-    year: int
+    day: int = Field(ge=1, le=31)
+    month: int = Field(ge=1, le=12)
+    year: int = Field(ge=1, le=9999)
     deaths_by_cases: float
     population: int
-    total_cases: int
-    new_cases: int
-    total_deaths: int
-    new_deaths: int
+    total_cases: Count
+    new_cases: Count
+    total_deaths: Count
+    new_deaths: Count
     total_deaths_per_million: float
     total_cases_per_million: float
 
 
+def frame_response(
+    data: pd.DataFrame,
+    data_format: str,
+    headers: dict,
+    *,
+    stream: bool = False,
+    chunk_rows: int = 50_000
+):
+    if data_format == "dict":
+        with span("encode.dict.fillna") as stage:
+            data = data.astype(object).fillna('')
+            stage.rows = data.shape[0]
+        with span("encode.dict.to_dict"):
+            records = data.to_dict()
+        with span("encode.dict.json") as stage:
+            result = JSONResponse(jsonable_encoder(records), headers=headers)
+            stage.bytes = len(result.body)
+        return result
+    if data_format == "ndjson" or (stream and data_format in STREAMING_FORMATS):
+        return StreamingResponse(
+            iter_encoded_frame(data, data_format, chunk_rows=chunk_rows),
+            media_type=MEDIA_TYPES[data_format],
+            headers=headers
+        )
+    with span(f"encode.{data_format}") as stage:
+        content, media_type = encode_frame(data, data_format)
+        stage.rows, stage.bytes = data.shape[0], len(content)
+    return fastapi.Response(content=content, media_type=media_type, headers=headers)
+
+
+def cached_response(entry, accept_encoding: str | None) -> fastapi.Response:
+    content, encoding = responses.body(entry, negotiate_encoding(accept_encoding))
+    headers = dict(entry.headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+    return fastapi.Response(content=content, media_type=entry.media_type, headers=headers)
+
+
+async def tee_into_cache(chunks, version, key, media_type: str, headers: dict):
+    parts, size = [], 0
+    async for chunk in chunks:
+        if parts is not None:
+            parts.append(chunk)
+            size += len(chunk)
+            if size > responses.max_entry_bytes:
+                parts = None
+        yield chunk
+    if parts is not None:
+        responses.put(version, key, b"".join(parts), media_type, headers)
+
+
 @app.get("/api/v1/data")
 def read_data(
     start_datetime: datetime,
     end_datetime: datetime,
+    data_format: str | None = fastapi.Query(None, alias="format"),
+    stream: bool = False,
+    chunk_rows: int = fastapi.Query(50_000, gt=0),
+    since: str | None = None,
+    columns: list[str] | None = fastapi.Query(None),
+    iso_code: list[str] | None = fastapi.Query(None),
+    continent: list[str] | None = fastapi.Query(None),
+    limit: int | None = fastapi.Query(None, gt=0),
+    after: str | None = None,
+    accept: str | None = fastapi.Header(None),
+    accept_encoding: str | None = fastapi.Header(None),
+    if_none_match: str | None = fastapi.Header(None),
+):
+    try:
+        data_format = negotiate_format(data_format, accept)
+    except UnsupportedFormat as e:
+        raise fastapi.HTTPException(status_code=406, detail=str(e))
+
+    store = deaths
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    query = (
+        start_datetime, end_datetime, after, limit, data_format, stream and chunk_rows,
+        tuple(columns or ()), tuple(iso_code or ()), tuple(continent or ())
+    )
+    etag = variant_etag(store.etag, *query)
+    for tag in (etag, encoded_etag(etag, negotiate_encoding(accept_encoding))):
+        if etag_matches(if_none_match, tag):
+            return fastapi.Response(status_code=304, headers={**headers, "ETag": tag})
+
+    version = (store.generation, store.version)
+    key = (since, *query)
+    entry = responses.get(version, key)
+    if entry is not None:
+        return cached_response(entry, accept_encoding)
+
+    watermark = store.resolve_since(since) if since else None
+    with span("read_data.window") as stage:
+        data, etag = store.tagged_window(start_datetime, end_datetime, since=watermark)
+        stage.rows = data.shape[0]
+    headers["ETag"] = variant_etag(etag, *query)
+    if watermark is not None:
+        headers["X-Delta-Since"] = since
+    try:
+        with span("read_data.select") as stage:
+            data, cursor = select_rows(
+                data,
+                columns=columns,
+                iso_codes=iso_code,
+                continents=continent,
+                after=store.resolve_cursor(parse_cursor(after)) if after else None,
+                limit=limit,
+                label_generation=store.label_generation
+            )
+            stage.rows = data.shape[0]
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    if cursor is not None:
+        headers["X-Next-Cursor"] = cursor
+
+    result = frame_response(data, data_format, headers, stream=stream, chunk_rows=chunk_rows)
+    if isinstance(result, StreamingResponse):
+        result.body_iterator = tee_into_cache(result.body_iterator, version, key, result.media_type, headers)
+        return result
+    return cached_response(responses.put(version, key, result.body, result.media_type, headers), accept_encoding)
+
+
+@app.get("/api/v1/countries/{iso_code}/series")
+def get_country_series(
+    iso_code: str,
+    start_datetime: datetime | None = None,
+    end_datetime: datetime | None = None,
+    data_format: str | None = fastapi.Query(None, alias="format"),
+    columns: list[str] | None = fastapi.Query(None),
+    accept: str | None = fastapi.Header(None),
+    if_none_match: str | None = fastapi.Header(None),
 ):
-    data = deaths.loc[
-        (deaths.date >= start_datetime) & (deaths.date <= end_datetime)
-        ]
-    return data.fillna('').to_dict()
+    try:
+        data_format = negotiate_format(data_format, accept)
+    except UnsupportedFormat as e:
+        raise fastapi.HTTPException(status_code=406, detail=str(e))
+
+    store = deaths
+    etag = variant_etag(store.etag, "series", iso_code, start_datetime, end_datetime, data_format, tuple(columns or ()))
+    headers = {"Vary": "Accept", "ETag": etag}
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers=headers)
+    index = countries
+    if iso_code not in index:
+        raise fastapi.HTTPException(status_code=404, detail=f"Unknown country {iso_code!r}")
+    try:
+        data, _ = select_rows(index.series(iso_code, start_datetime, end_datetime), columns=columns)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    return frame_response(data, data_format, headers)
+
+
+@app.get("/api/v1/snapshot")
+def get_snapshot(
+    date: datetime | None = None,
+    exact: bool = False,
+    data_format: str | None = fastapi.Query(None, alias="format"),
+    columns: list[str] | None = fastapi.Query(None),
+    accept: str | None = fastapi.Header(None),
+    if_none_match: str | None = fastapi.Header(None),
+):
+    try:
+        data_format = negotiate_format(data_format, accept)
+    except UnsupportedFormat as e:
+        raise fastapi.HTTPException(status_code=406, detail=str(e))
+
+    store = deaths
+    etag = variant_etag(store.etag, "snapshot", date, exact, data_format, tuple(columns or ()))
+    headers = {"Vary": "Accept", "ETag": etag}
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers=headers)
+    if date is None:
+        data = latest.snapshot()
+    else:
+        data = countries.as_of(date, exact=exact)
+    try:
+        data, _ = select_rows(data, columns=columns)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    return frame_response(data, data_format, headers)
 
 
 @app.get("/api/v1/nans-counts")
-def get_nans_value_counts():
-    return get_bar_data(os.environ["deaths_filename"])
+def get_nans_value_counts(response: fastapi.Response, if_none_match: str | None = fastapi.Header(None)):
+    etag = variant_etag(file_etag(os.environ["deaths_filename"]), "nans-counts")
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    with span("get_bar_data"):
+        return get_bar_data(os.environ["deaths_filename"], **CSV_OPTIONS)
 
 
 @app.get("/api/v1/get-pies-data")
-def get_nans_value_counts():
-    return get_pies_data(os.environ["deaths_filename"])
+def get_nans_value_counts(response: fastapi.Response, if_none_match: str | None = fastapi.Header(None)):
+    etag = variant_etag(file_etag(os.environ["deaths_filename"]), "pies")
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    with span("get_pies_data"):
+        return get_pies_data(os.environ["deaths_filename"], **CSV_OPTIONS)
+
+
+@app.get("/api/v1/gdp-unmatched")
+def get_gdp_unmatched():
+    return gdp_unmatched
+
+
+def memoized_json(key: tuple, compute, if_none_match: str | None) -> fastapi.Response:
+    store = deaths
+    etag = variant_etag(store.etag, *key)
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers={"ETag": etag})
+    try:
+        content = aggregates.get(store.version, (store.generation, *key), lambda: compute(store.frame))
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    return fastapi.Response(content=content, media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/api/v1/aggregate")
+def get_aggregate(
+    by: list[str] = fastapi.Query(...),
+    metrics: list[str] = fastapi.Query(...),
+    reducers: list[str] = fastapi.Query(["mean"]),
+    if_none_match: str | None = fastapi.Header(None),
+):
+    return memoized_json(
+        ("aggregate", tuple(by), tuple(metrics), tuple(reducers)),
+        lambda frame: aggregate(frame, by=by, metrics=metrics, reducers=reducers).to_json(
+            orient="split", index=False, double_precision=15
+        ),
+        if_none_match
+    )
+
+
+@app.get("/api/v1/describe")
+def get_describe(if_none_match: str | None = fastapi.Header(None)):
+    return memoized_json(
+        ("describe",),
+        lambda frame: describe(frame).to_json(orient="split", date_format="iso", double_precision=15),
+        if_none_match
+    )
+
+
+@app.get("/api/v1/correlations")
+def get_correlations(if_none_match: str | None = fastapi.Header(None)):
+    return memoized_json(
+        ("correlations",),
+        lambda frame: correlations(frame).to_json(orient="split", double_precision=15),
+        if_none_match
+    )
+
+
+@app.get("/api/v1/hypothesis/gdp")
+def get_gdp_hypothesis(
+    response: fastapi.Response,
+    metrics: list[str] = fastapi.Query(["total_deaths_per_million"]),
+    q: int = 3,
+    if_none_match: str | None = fastapi.Header(None),
+):
+    store = deaths
+    etag = variant_etag(store.etag, "hypothesis", tuple(metrics), q)
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers={"ETag": etag})
+    try:
+        result = hypotheses.get(
+            store.version,
+            (store.generation, tuple(metrics), q),
+            lambda: run_hypothesis(store.frame, metrics=metrics, q=q, executor=hypothesis_pool)
+        )
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    response.headers["ETag"] = etag
+    return result
+
+
+@app.get("/api/v1/rollups/{cube}")
+def get_rollup(
+    cube: str,
+    metrics: list[str] = fastapi.Query(...),
+    reducer: str = "mean",
+    keys: list[str] | None = fastapi.Query(None),
+    if_none_match: str | None = fastapi.Header(None),
+):
+    if cube not in CUBES:
+        raise fastapi.HTTPException(status_code=404, detail=f"Unknown cube {cube!r}")
+    etag = variant_etag(deaths.etag, "rollup", cube, tuple(metrics), reducer, tuple(keys or ()))
+    if etag_matches(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers={"ETag": etag})
+    try:
+        result = rollups[cube].query(metrics=metrics, reducer=reducer, keys=keys)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    return fastapi.Response(
+        content=result.to_json(orient="split", index=False, double_precision=15),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+
+@app.get("/healthz")
+def get_health():
+    if readiness.failed:
+        return JSONResponse(status_code=500, content=readiness.status())
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def get_readiness():
+    status = readiness.status()
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content=status, headers={"Retry-After": retry_after})
+    return status
+
+
+@app.get("/metrics")
+def get_metrics():
+    return fastapi.Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/api/v1/data")
 def create_data(item: Item):
-    global deaths
-
-    new_data = pd.DataFrame([item.model_dump()])
-    deaths = pd.concat([deaths, new_data], ignore_index=True)
+    records = [item.model_dump()]
+    try:
+        rows = deaths.prepare(records)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=422, detail=str(e))
+    with write_lock:
+        if wal is not None:
+            with span("create_data.wal") as stage:
+                wal.append(records)
+                stage.rows = len(records)
+        with span("create_data.store") as stage:
+            deaths.append(rows)
+            stage.rows = len(records)
+    responses.clear()
 
     return {"message": "Data created successfully"}
 
 
+@app.post("/api/v1/data/batch")
+def create_data_batch(items: list[Item]):
+    records = [item.model_dump() for item in items]
+    try:
+        rows = deaths.prepare(records)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=422, detail=str(e))
+    with write_lock:
+        if wal is not None:
+            with span("create_data_batch.wal") as stage:
+                wal.append(records)
+                stage.rows = len(records)
+        with span("create_data_batch.store") as stage:
+            deaths.append(rows)
+            stage.rows = len(records)
+    responses.clear()
+
+    return {"message": "Data created successfully", "count": len(items)}
+
+
 if __name__ == "__main__":
     import uvicorn
 
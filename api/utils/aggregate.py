@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+__all__ = ("GROUP_KEYS", "METRICS", "REDUCERS", "aggregate", "describe", "correlations")
+
+GROUP_KEYS = ("year", "month", "continent", "iso_code")
+METRICS = (
+    "total_cases",
+    "new_cases",
+    "total_deaths",
+    "new_deaths",
+    "total_deaths_per_million",
+    "total_cases_per_million",
+    "deaths_by_cases",
+    "gdp",
+)
+REDUCERS = ("mean", "sum", "max", "min", "count")
+
+
+def aggregate(frame: pd.DataFrame, *, by: list, metrics: list, reducers: list) -> pd.DataFrame:
+    for name, values, allowed in (
+        ("group keys", by, GROUP_KEYS),
+        ("metrics", metrics, METRICS),
+        ("reducers", reducers, REDUCERS),
+    ):
+        if not values or any(value not in allowed for value in values):
+            raise ValueError(f"Invalid {name} {list(values)!r}, expected some of {', '.join(allowed)}")
+
+    result = frame.groupby(list(by), observed=True, sort=True)[list(metrics)].agg(list(reducers))
+    if len(reducers) == 1:
+        result.columns = result.columns.get_level_values(0)
+    else:
+        result.columns = [f"{metric}_{reducer}" for metric, reducer in result.columns]
+    return result.reset_index()
+
+
+def describe(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.describe()
+
+
+def _label_codes(column: pd.Series) -> np.ndarray:
+    column = column.astype("category").cat.remove_unused_categories()
+    ranks = np.argsort(np.argsort(column.cat.categories.astype(str).to_numpy(), kind="stable"))
+    codes = column.cat.codes.to_numpy()
+    return np.where(codes >= 0, ranks[codes], np.nan)
+
+
+def correlations(frame: pd.DataFrame, *, encode: tuple = ("continent", "location"), drop: tuple = ("iso_code",)):
+    frame = frame.drop(columns=list(drop)).assign(**{column: _label_codes(frame[column]) for column in encode})
+    return frame.corr()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .data import load_deaths, load_gdp, load_gdp2
+from .locking import file_lock
+
+__all__ = ("fingerprint", "write_frame", "read_frame", "read_frame_key", "load_deaths_cached")
+
+_META_FILENAME = "meta.json"
+_SAMPLE_SIZE = 1 << 16
+_FORMAT_VERSION = 3
+
+
+def _file_fingerprint(path: str) -> dict:
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        digest.update(file.read(_SAMPLE_SIZE))
+        if stat.st_size > _SAMPLE_SIZE:
+            file.seek(max(_SAMPLE_SIZE, stat.st_size - _SAMPLE_SIZE))
+            digest.update(file.read(_SAMPLE_SIZE))
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+    }
+
+
+def fingerprint(*paths: str, **parameters) -> str:
+    key = {
+        "format": _FORMAT_VERSION,
+        "files": [_file_fingerprint(path) for path in paths],
+        "parameters": parameters,
+    }
+    return hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def _encode_column(column: pd.Series) -> tuple:
+    if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biufmM":
+        return {"kind": "values"}, {"values": column.to_numpy()}
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+        return {"kind": "categorical", "categories": categories.tolist()}, {"codes": column.cat.codes.to_numpy()}
+    if isinstance(column.array, pd.arrays.IntegerArray):
+        return {"kind": "masked"}, {
+            "values": column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0),
+            "mask": column.isna().to_numpy(),
+        }
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    return {"kind": "factorized", "categories": list(uniques)}, {"codes": codes.astype("int32")}
+
+
+def _decode_column(meta: dict, arrays: dict):
+    if meta["kind"] == "values":
+        return arrays["values"]
+    if meta["kind"] == "categorical":
+        return pd.Categorical.from_codes(arrays["codes"], categories=meta["categories"], validate=False)
+    if meta["kind"] == "masked":
+        return pd.arrays.IntegerArray(arrays["values"], arrays["mask"])
+    codes = arrays["codes"]
+    values = np.asarray(meta["categories"] + [np.nan], dtype=object)
+    return values[codes]
+
+
+def write_frame(frame: pd.DataFrame, directory: str, *, key: str) -> None:
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    columns = []
+    for i, name in enumerate(frame.columns):
+        column_meta, arrays = _encode_column(frame[name])
+        for suffix, array in arrays.items():
+            np.save(os.path.join(tmp_directory, f"{i}.{suffix}.npy"), array, allow_pickle=False)
+        columns.append({"name": name, "dtype": str(frame[name].dtype), "arrays": list(arrays), **column_meta})
+    np.save(os.path.join(tmp_directory, "index.npy"), frame.index.to_numpy(), allow_pickle=False)
+
+    with open(os.path.join(tmp_directory, _META_FILENAME), "w") as file:
+        json.dump({"key": key, "rows": int(frame.shape[0]), "columns": columns, "attrs": frame.attrs}, file)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+
+
+def _read_meta(directory: str) -> dict | None:
+    try:
+        with open(os.path.join(directory, _META_FILENAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def read_frame_key(directory: str) -> str | None:
+    meta = _read_meta(directory)
+    return None if meta is None else meta["key"]
+
+
+def read_frame(directory: str, *, key: str = None, mmap: bool = False) -> pd.DataFrame | None:
+    meta = _read_meta(directory)
+    if meta is None:
+        return None
+    if key is not None and meta["key"] != key:
+        return None
+
+    mmap_mode = "r" if mmap else None
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        arrays = {
+            suffix: np.load(os.path.join(directory, f"{i}.{suffix}.npy"), mmap_mode=mmap_mode)
+            for suffix in column["arrays"]
+        }
+        values = pd.Series(_decode_column(column, arrays), copy=False)
+        if column["kind"] in ("values", "factorized"):
+            values = values.astype(column["dtype"], copy=False)
+        data[column["name"]] = values
+    index = np.load(os.path.join(directory, "index.npy"), mmap_mode=mmap_mode)
+    frame = pd.DataFrame(data, copy=False)
+    frame.index = index
+    frame.attrs.update(meta.get("attrs", {}))
+    return frame
+
+
+def load_deaths_cached(
+    cache_dir: str,
+    path: str,
+    *,
+    gdp_path: str,
+    gdp2_path: str,
+    years: list = None,
+    mmap: bool = False,
+    engine: str = "c",
+    chunk_rows: int = None
+) -> pd.DataFrame:
+    if years is None:
+        years = ["2020", "2021", "2022"]
+
+    def load():
+        return load_deaths(
+            path,
+            gdp=load_gdp(gdp_path, engine=engine),
+            gdp2=load_gdp2(gdp2_path, engine=engine),
+            years=years,
+            engine=engine,
+            chunk_rows=chunk_rows
+        )
+
+    key = fingerprint(path, gdp_path, gdp2_path, years=list(years))
+    if not cache_dir:
+        deaths = load()
+        deaths.attrs["fingerprint"] = key
+        return deaths
+    directory = os.path.join(cache_dir, "deaths")
+
+    deaths = read_frame(directory, key=key, mmap=mmap)
+    if deaths is None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with file_lock(os.path.join(cache_dir, "deaths.lock")):
+            deaths = read_frame(directory, key=key, mmap=mmap)
+            if deaths is None:
+                deaths = load()
+                deaths = deaths.sort_values("date", kind="stable")
+                write_frame(deaths, directory, key=key)
+                if mmap:
+                    deaths = read_frame(directory, key=key, mmap=True)
+    deaths.attrs["fingerprint"] = key
+    return deaths
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .data import concat_frames
+from .store import _to_datetime64
+
+__all__ = ("CountryIndex",)
+
+
+class _Positions:
+    def __init__(self, frame: pd.DataFrame):
+        if not frame.date.is_monotonic_increasing:
+            frame = frame.take(np.argsort(frame.date.to_numpy(), kind="stable"))
+        codes = frame.iso_code.cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]
+        self.frame = frame
+        self.order = order
+        self._dates = frame.date.to_numpy()
+
+        sorted_codes = codes[order]
+        categories = np.arange(len(frame.iso_code.cat.categories))
+        starts = np.searchsorted(sorted_codes, categories, side="left")
+        ends = np.searchsorted(sorted_codes, categories, side="right")
+        self.offsets = {
+            iso: (int(start), int(end))
+            for iso, start, end in zip(frame.iso_code.cat.categories, starts, ends)
+            if end > start
+        }
+
+    def __contains__(self, iso_code: str) -> bool:
+        return iso_code in self.offsets
+
+    def _position(self, date, side: str) -> int:
+        return np.searchsorted(self._dates, _to_datetime64(date, self._dates.dtype), side=side)
+
+    def series(self, iso_code: str, start=None, end=None) -> pd.DataFrame:
+        lo, hi = self.offsets[iso_code]
+        positions = self.order[lo:hi]
+        first = 0 if start is None else np.searchsorted(positions, self._position(start, "left"))
+        last = positions.shape[0] if end is None else np.searchsorted(positions, self._position(end, "right"))
+        return self.frame.iloc[positions[first:max(first, last)]]
+
+    def as_of(self, date, *, exact: bool = False) -> pd.DataFrame:
+        bound = self._position(date, "right")
+        target = _to_datetime64(date, self._dates.dtype)
+        positions = []
+        for lo, hi in self.offsets.values():
+            found = lo + np.searchsorted(self.order[lo:hi], bound) - 1
+            if found >= lo and (not exact or self._dates[self.order[found]] == target):
+                positions.append(self.order[found])
+        return self.frame.iloc[positions]
+
+
+class CountryIndex:
+    def __init__(self, frame: pd.DataFrame):
+        self._lock = threading.Lock()
+        self._base = _Positions(frame)
+        self._runs = ()
+
+    def update(self, rows: pd.DataFrame) -> None:
+        with self._lock:
+            runs, rows = self._runs, rows.loc[rows.iso_code.notna()]
+            if not rows.shape[0]:
+                return
+            while runs and runs[-1].frame.shape[0] <= rows.shape[0]:
+                rows = concat_frames([runs[-1].frame, rows])
+                runs = runs[:-1]
+            self._runs = runs + (_Positions(rows),)
+
+    def _levels(self) -> tuple:
+        return (self._base, *self._runs)
+
+    def __contains__(self, iso_code: str) -> bool:
+        return any(iso_code in level for level in self._levels())
+
+    def series(self, iso_code: str, start=None, end=None) -> pd.DataFrame:
+        parts = [level.series(iso_code, start, end) for level in self._levels() if iso_code in level]
+        if len(parts) == 1:
+            return parts[0]
+        data = concat_frames(parts)
+        return data.take(np.argsort(data.date.to_numpy(), kind="stable"))
+
+    def as_of(self, date, *, exact: bool = False) -> pd.DataFrame:
+        levels = self._levels()
+        if len(levels) == 1:
+            return levels[0].as_of(date, exact=exact)
+        data = concat_frames([level.as_of(date) for level in levels])
+        data = data.take(np.argsort(data.date.to_numpy(), kind="stable")).drop_duplicates("iso_code", keep="last")
+        if exact:
+            data = data.loc[data.date == _to_datetime64(date, data.date.dtype)]
+        return data.sort_values("iso_code", kind="stable")
@@ -1,7 +1,26 @@
+import os
+import logging
+import functools
+
 import numpy as np
 import pandas as pd
 
-__all__ = ("load_deaths", "load_gdp", "USEFUL_COLUMNS", "NUM_COLUMNS", "get_bar_data", "get_pies_data")
+from .metrics import span
+from .ingest import iter_deaths, read_gdp, read_gdp2
+
+__all__ = (
+    "load_deaths",
+    "load_gdp",
+    "load_gdp2",
+    "apply_schema",
+    "schema_violations",
+    "concat_frames",
+    "DEATHS_SCHEMA",
+    "USEFUL_COLUMNS",
+    "NUM_COLUMNS",
+    "get_bar_data",
+    "get_pies_data"
+)
 _NUMERIC_COLUMNS = [
     "total_cases", "new_cases",
     "total_deaths", "new_deaths",
@@ -23,6 +42,7 @@ _GDP_COLUMNS = {
     "2022 [YR2022]": "2022",
     "2023 [YR2023]": "2023",
 }
+_logger = logging.getLogger(__name__)
 USEFUL_COLUMNS = [
     "iso_code",
     "continent",
@@ -37,6 +57,68 @@ USEFUL_COLUMNS = [
 ]
 NUM_COLUMNS = ["total_cases", "new_cases", "total_deaths", "new_deaths"]
 PIE_COLUMNS = ["date"] + NUM_COLUMNS
+DEATHS_SCHEMA = {
+    "iso_code": "category",
+    "continent": "category",
+    "location": "category",
+    "date": "datetime64[ns]",
+    "total_cases": "Int32",
+    "new_cases": "Int32",
+    "total_deaths": "Int32",
+    "new_deaths": "Int32",
+    "total_deaths_per_million": "float64",
+    "total_cases_per_million": "float64",
+    "year": "int16",
+    "month": "int8",
+    "day": "int8",
+    "deaths_by_cases": "float64",
+    "gdp": "float64",
+}
+_CATEGORICAL_COLUMNS = [column for column, dtype in DEATHS_SCHEMA.items() if dtype == "category"]
+_NULLABLE_DTYPES = ("Int32",)
+
+
+def apply_schema(frame: pd.DataFrame) -> pd.DataFrame:
+    violations = schema_violations(frame).any(axis=0)
+    if violations.any():
+        raise ValueError(f"Values out of range for columns {', '.join(violations.index[violations.to_numpy()])}")
+    columns = {}
+    for column, dtype in DEATHS_SCHEMA.items():
+        values = frame[column] if column in frame.columns else pd.Series(np.nan, index=frame.index)
+        if dtype in _NULLABLE_DTYPES:
+            values = pd.to_numeric(values, errors="coerce")
+        columns[column] = values.astype(dtype)
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def schema_violations(frame: pd.DataFrame) -> pd.DataFrame:
+    violations = {}
+    for column, dtype in DEATHS_SCHEMA.items():
+        if column not in frame.columns:
+            continue
+        if column == "date":
+            violations[column] = frame[column].isna().to_numpy()
+        elif pd.api.types.is_integer_dtype(dtype):
+            values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            info = np.iinfo(pd.api.types.pandas_dtype(dtype).type)
+            with np.errstate(invalid="ignore"):
+                invalid = (values < info.min) | (values > info.max) | (values != np.trunc(values))
+            violations[column] = np.where(np.isnan(values), dtype not in _NULLABLE_DTYPES, invalid)
+    return pd.DataFrame(violations, index=frame.index)
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    frames = [frame for frame in frames if frame.shape[0]] or frames[:1]
+    for column in _CATEGORICAL_COLUMNS:
+        categories = pd.Index(frames[0][column].cat.categories)
+        for frame in frames[1:]:
+            categories = categories.append(frame[column].cat.categories.difference(categories))
+        frames = [
+            frame if frame[column].cat.categories.equals(categories)
+            else frame.assign(**{column: frame[column].cat.set_categories(categories)})
+            for frame in frames
+        ]
+    return pd.concat(frames)
 
 
 def _get_deaths_by_cases(data_columns):
@@ -51,8 +133,38 @@ def _get_deaths_by_cases(data_columns):
     return result
 
 
-def _get_gdp(row: pd.Series):
-    return row[str(row.date.year)]
+def _filter_deaths(deaths: pd.DataFrame, max_year: int) -> pd.DataFrame:
+    deaths = deaths.loc[~deaths.iso_code.str.contains("OWID", regex=False, na=True)]
+    deaths = deaths.loc[~deaths[_NUMERIC_COLUMNS].isna().all(axis=1), USEFUL_COLUMNS]
+    return deaths.loc[deaths.date.dt.year < (max_year + 1)]
+
+
+def _normalize_names(names: pd.Series) -> pd.Series:
+    return names.astype(str).str.casefold().str.replace(r"[^\w\s]", " ", regex=True).str.split().str.join(" ")
+
+
+def _match_names(names: pd.Series, countries: pd.Series) -> pd.Series:
+    exact = pd.Series(countries.index, index=countries.to_numpy())
+    matches = names.map(exact.loc[~exact.index.duplicated()])
+    padded = " " + countries + " "
+    for position, name in names.loc[matches.isna()].items():
+        found = padded.index[padded.str.contains(f" {name} ", regex=False)]
+        if len(found):
+            matches[position] = found[0]
+    return matches
+
+
+def _gdp_table(locations: pd.DataFrame, gdp: pd.DataFrame, gdp2: pd.DataFrame, years: list) -> tuple:
+    by_iso = gdp.drop_duplicates("Country Code").set_index("Country Code")[years]
+    missing = locations.loc[~locations.iso_code.isin(by_iso.index)]
+
+    countries = gdp2.loc[gdp2.Country.notna()]
+    matches = _match_names(_normalize_names(missing.location), _normalize_names(countries.Country))
+    found = matches.notna()
+    by_name = countries.loc[matches[found].astype("int64"), years].set_axis(missing.iso_code[found])
+
+    unmatched = dict(zip(missing.iso_code[~found], missing.location[~found]))
+    return pd.concat([by_iso.astype(object), by_name.astype(object)]), unmatched
 
 
 def load_deaths(
@@ -60,88 +172,102 @@ def load_deaths(
     *,
     gdp: pd.DataFrame,
     gdp2: pd.DataFrame,
-    years: list = None
+    years: list = None,
+    offset: int = 0,
+    engine: str = "c",
+    chunk_rows: int = None
 ) -> pd.DataFrame:
     if years is None:
         years = ["2020", "2021", "2022"]
     max_year = max(map(int, years))
-    deaths = pd.read_csv(path)
-    deaths[_NUMERIC_COLUMNS] = deaths[_NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
-    deaths.date = pd.to_datetime(deaths.date)
-    deaths = deaths.loc[deaths.iso_code.apply(lambda x: "OWID" not in x)]
-    deaths = deaths.loc[~deaths[_NUMERIC_COLUMNS].isna().all(axis=1), USEFUL_COLUMNS]
-    deaths = deaths.loc[deaths.date.apply(lambda x: x.year < (max_year + 1))]
-
-    deaths["year"] = deaths.date.apply(lambda x: x.year)
-    deaths["month"] = deaths.date.apply(lambda x: x.month)
-    deaths["day"] = deaths.date.apply(lambda x: x.day)
-    deaths["deaths_by_cases"] = _get_deaths_by_cases(deaths[["total_deaths", "total_cases"]])
-
-    locations = {}
-    unique_names = gdp2.Country.unique()
-    unused_locations = []
-
-    for location in deaths.iso_code.unique():
-        if location in gdp["Country Code"].unique():
-            locations[location] = gdp.loc[gdp["Country Code"] == location, years].to_dict()
-        else:
-            name = deaths.loc[deaths.iso_code == location].location.values[0]
-
-            for country in unique_names:
-                if isinstance(country, float):
-                    continue
-                if name in country:
-                    locations[name] = gdp2.loc[gdp2.Country == country, years].to_dict()
-                    break
-            else:
-                unused_locations.append(location)
-    for location in locations.keys():
-        locations[location] = {k: list(v.values())[0] for k, v in locations[location].items()}
-
-    gpd_dataframe = pd.DataFrame(locations).T.reset_index()
-    deaths = deaths.merge(gpd_dataframe, left_on="iso_code", right_on="index")
-    deaths = deaths.drop("index", axis=1)
-    deaths["gdp"] = deaths.apply(_get_gdp, axis=1)
-    deaths = deaths.drop(years, axis=1)
-    deaths = deaths.loc[deaths.gdp != ".."]
-    deaths["gdp"] = pd.to_numeric(deaths['gdp'], errors='coerce')
+    frames = []
+    for chunk in iter_deaths(path, offset=offset, engine=engine, chunk_rows=chunk_rows):
+        with span("load_deaths.filter") as stage:
+            frames.append(_filter_deaths(chunk, max_year))
+            stage.rows = frames[-1].shape[0]
+    deaths = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    del frames
+
+    with span("load_deaths.derive"):
+        deaths["year"] = deaths.date.dt.year.astype("int64")
+        deaths["month"] = deaths.date.dt.month.astype("int64")
+        deaths["day"] = deaths.date.dt.day.astype("int64")
+        deaths["deaths_by_cases"] = _get_deaths_by_cases(deaths[["total_deaths", "total_cases"]])
+
+    with span("load_deaths.gdp_table") as stage:
+        table, unmatched = _gdp_table(deaths.drop_duplicates("iso_code")[["iso_code", "location"]], gdp, gdp2, years)
+        stage.rows = table.shape[0]
+    if unmatched:
+        _logger.warning("No GDP data for %d locations: %s", len(unmatched), ", ".join(map(str, unmatched.values())))
+
+    with span("load_deaths.gdp_join") as stage:
+        rows = table.index.get_indexer(deaths.iso_code)
+        deaths = deaths.loc[rows >= 0].reset_index(drop=True)
+        rows = rows[rows >= 0]
+        columns = pd.Index(years).get_indexer(deaths.year.astype(str))
+        values = table.to_numpy(dtype=object)[rows, columns]
+        values[columns < 0] = np.nan
+        deaths["gdp"] = values
+        deaths = deaths.loc[deaths.gdp != ".."]
+        deaths["gdp"] = pd.to_numeric(deaths['gdp'], errors='coerce')
+        stage.rows = deaths.shape[0]
 
+    with span("load_deaths.schema") as stage:
+        deaths = apply_schema(deaths)
+        stage.bytes = int(deaths.memory_usage(deep=False).sum())
+    deaths.attrs["gdp_unmatched"] = unmatched
     return deaths
 
 
-def load_gdp(path: str) -> pd.DataFrame:
-    gdp = pd.read_csv(path)
+def load_gdp(path: str, *, engine: str = "c") -> pd.DataFrame:
+    gdp = read_gdp(path, engine=engine)
     gdp = gdp.rename(_GDP_COLUMNS, axis=1)
     return gdp
 
 
-def get_bar_data(path: str) -> dict:
-    deaths = pd.read_csv(path)
-    deaths[_NUMERIC_COLUMNS] = deaths[_NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
-    deaths.date = pd.to_datetime(deaths.date)
-    rows_with_nans = deaths.loc[deaths[USEFUL_COLUMNS].isna().any(axis=1), USEFUL_COLUMNS]
-    all_nans_indexes = rows_with_nans[NUM_COLUMNS].isna().all(axis=1)
-    return rows_with_nans[~all_nans_indexes].date.apply(lambda x: x.year).value_counts().to_dict()
-
-
-def get_pies_data(path: str):
-    deaths = pd.read_csv(path)
-    deaths[_NUMERIC_COLUMNS] = deaths[_NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
-    deaths.date = pd.to_datetime(deaths.date)
-    data_without_all_nans = deaths.loc[~deaths[_NUMERIC_COLUMNS].isna().all(axis=1), USEFUL_COLUMNS]
-    processed_rows_with_nans = data_without_all_nans.loc[:, PIE_COLUMNS]
-    processed_rows_with_nans.date = processed_rows_with_nans.date.apply(lambda x: x.year)
-    years = list(processed_rows_with_nans.date.unique())
-    years.sort()
-    years.pop(-1)
-    result = {}
-    for i, year in enumerate(years):
-        data = processed_rows_with_nans.loc[processed_rows_with_nans.date == year].drop("date", axis=1)
-        result[str(year)] = {
+def load_gdp2(path: str, *, engine: str = "c") -> pd.DataFrame:
+    return read_gdp2(path, engine=engine)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_nans_stats(path: str, size: int, mtime: int, engine: str = "c", chunk_rows: int = None) -> tuple:
+    bar_data, pies_counts = None, []
+    for deaths in iter_deaths(path, engine=engine, chunk_rows=chunk_rows):
+        years = deaths.date.dt.year
+
+        with span("nans_stats.bar"):
+            rows_with_nans = deaths[USEFUL_COLUMNS].isna().any(axis=1)
+            all_nans_indexes = deaths[NUM_COLUMNS].isna().all(axis=1)
+            counts = years[rows_with_nans & ~all_nans_indexes].value_counts()
+            bar_data = counts if bar_data is None else bar_data.add(counts, fill_value=0).astype("int64")
+
+        with span("nans_stats.pies"):
+            with_values = ~deaths[_NUMERIC_COLUMNS].isna().all(axis=1)
+            pies_counts.append(deaths.loc[with_values, NUM_COLUMNS].isna().groupby(years[with_values]).sum())
+
+    if len(pies_counts) > 1:
+        bar_data = bar_data.sort_values(ascending=False, kind="stable")
+    pies_counts = pd.concat(pies_counts).groupby(level=0).sum()
+    pies_data = {}
+    for i, year in enumerate(pies_counts.index[:-1]):
+        pies_data[str(year)] = {
             "row": int((i // 2) + 1),
             "col": int((i % 2) + 1),
-            "labels": list(data.columns.astype(str).to_list()),
-            "values": list(data.isna().sum().values.tolist()),
+            "labels": list(pies_counts.columns.astype(str).to_list()),
+            "values": list(pies_counts.loc[year].values.tolist()),
             "name": str(year)
         }
-    return result
+    return bar_data.to_dict(), pies_data
+
+
+def _nans_stats(path: str, engine: str, chunk_rows: int) -> tuple:
+    stat = os.stat(path)
+    return _get_nans_stats(path, stat.st_size, stat.st_mtime_ns, engine, chunk_rows)
+
+
+def get_bar_data(path: str, *, engine: str = "c", chunk_rows: int = None) -> dict:
+    return _nans_stats(path, engine, chunk_rows)[0]
+
+
+def get_pies_data(path: str, *, engine: str = "c", chunk_rows: int = None):
+    return _nans_stats(path, engine, chunk_rows)[1]
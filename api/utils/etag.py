@@ -0,0 +1,32 @@
+import hashlib
+import os
+
+__all__ = ("etag_matches", "file_etag", "variant_etag", "encoded_etag")
+
+
+def _strip_weak(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _strip_weak(etag) in {_strip_weak(tag) for tag in if_none_match.split(",")}
+
+
+def file_etag(path: str) -> str:
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def variant_etag(etag: str, *parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=6).hexdigest()
+    return f'"{_strip_weak(etag).strip(chr(34))}-{digest}"'
+
+
+def encoded_etag(etag: str, encoding: str | None) -> str:
+    if encoding is None:
+        return etag
+    return f'"{_strip_weak(etag).strip(chr(34))}-{encoding}"'
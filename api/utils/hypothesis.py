@@ -0,0 +1,126 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+__all__ = ("METRICS", "gdp_groups", "pairwise_tests", "run_hypothesis")
+
+METRICS = {
+    "total_deaths_per_million": "new_deaths",
+    "total_cases_per_million": "new_cases",
+    "total_deaths": "new_deaths",
+    "total_cases": "new_cases",
+}
+_LABELS = {
+    2: ("Low", "High"),
+    3: ("Low", "Medium", "High"),
+}
+_EXACT_SIZE = 8
+
+
+def _labels(q: int) -> list:
+    return list(_LABELS.get(q, [f"Q{i + 1}" for i in range(q)]))
+
+
+def _nonzero(values: pd.Series) -> np.ndarray:
+    return values.to_numpy(dtype="float64", na_value=np.nan) != 0
+
+
+def gdp_groups(frame: pd.DataFrame, *, metric: str, q: int = 3) -> dict:
+    if metric not in METRICS:
+        raise ValueError(f"Invalid metric {metric!r}, expected one of {', '.join(METRICS)}")
+    if q < 2:
+        raise ValueError(f"Invalid quantile count {q!r}, expected at least 2")
+
+    frame = frame.loc[_nonzero(frame[METRICS[metric]]) & _nonzero(frame[metric]), ["iso_code", "date", "gdp", metric]]
+    frame = frame.dropna(subset=[metric, "gdp"])
+    frame = frame.drop_duplicates(subset=["iso_code", "date"])
+    frame = frame.sort_values(by=["iso_code", "date"])
+
+    labels = _labels(q)
+    groups = pd.qcut(frame.gdp, q=q, labels=labels)
+    rates = frame.groupby("iso_code", observed=True)[metric].diff().to_numpy()
+    positive = rates > 0
+    codes = groups.cat.codes.to_numpy()[positive]
+    rates = rates[positive]
+    return {label: np.sort(rates[codes == code]) for code, label in enumerate(labels)}
+
+
+def _summary(values: np.ndarray) -> dict:
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    return {
+        "values": values,
+        "unique": values[starts],
+        "counts": np.diff(np.r_[starts, values.shape[0]]),
+        "mean": values.mean() if values.shape[0] else np.nan,
+        "std": values.std(ddof=1) if values.shape[0] > 1 else np.nan,
+    }
+
+
+def _float(value) -> float | None:
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def _mannwhitneyu(x: dict, y: dict) -> tuple:
+    n1, n2 = x["values"].shape[0], y["values"].shape[0]
+    if not n1 or not n2:
+        return np.nan, np.nan
+    ties = np.concatenate([x["unique"], y["unique"]])
+    counts = np.concatenate([x["counts"], y["counts"]])
+    if max(n1, n2) <= _EXACT_SIZE and ties.shape[0] == np.unique(ties).shape[0]:
+        result = stats.mannwhitneyu(x["values"], y["values"], alternative="two-sided")
+        return result.statistic, result.pvalue
+
+    less = np.searchsorted(y["values"], x["unique"], side="left")
+    equal = np.searchsorted(y["values"], x["unique"], side="right") - less
+    u1 = float(np.sum(x["counts"] * (less + 0.5 * equal)))
+
+    order = np.argsort(ties, kind="stable")
+    ties, counts = ties[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, ties[1:] != ties[:-1]])
+    t = np.add.reduceat(counts, starts).astype("float64")
+    n = n1 + n2
+    sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - np.sum(t ** 3 - t) / (n * (n - 1))))
+    u = max(u1, n1 * n2 - u1)
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return u1, float(np.clip(2 * stats.norm.sf(z), 0, 1))
+
+
+def _compare(pair: tuple) -> dict:
+    (a, x), (b, y) = pair
+    t_stat, t_pvalue = stats.ttest_ind_from_stats(
+        x["mean"], x["std"], x["values"].shape[0],
+        y["mean"], y["std"], y["values"].shape[0],
+        equal_var=False
+    )
+    u_stat, u_pvalue = _mannwhitneyu(x, y)
+    return {
+        "a": a,
+        "b": b,
+        "ttest": {"statistic": _float(t_stat), "pvalue": _float(t_pvalue)},
+        "mannwhitneyu": {"statistic": _float(u_stat), "pvalue": _float(u_pvalue)},
+    }
+
+
+def pairwise_tests(groups: dict, *, executor=None) -> list:
+    summaries = [(label, _summary(values)) for label, values in groups.items()]
+    pairs = list(itertools.combinations(summaries, 2))
+    if executor is None:
+        return list(map(_compare, pairs))
+    return list(executor.map(_compare, pairs))
+
+
+def run_hypothesis(frame: pd.DataFrame, *, metrics: list, q: int = 3, executor=None) -> dict:
+    result = {}
+    for metric in metrics:
+        groups = gdp_groups(frame, metric=metric, q=q)
+        result[metric] = {
+            "groups": [
+                {"group": label, "count": int(values.shape[0]), "mean": _float(values.mean()) if values.shape[0] else None}
+                for label, values in groups.items()
+            ],
+            "pairs": pairwise_tests(groups, executor=executor),
+        }
+    return result
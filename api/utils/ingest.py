@@ -0,0 +1,149 @@
+import io
+import logging
+
+import pandas as pd
+
+from .metrics import span
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+__all__ = ("ENGINES", "DEATHS_COLUMNS", "iter_deaths", "read_gdp", "read_gdp2")
+
+ENGINES = ("c", "pyarrow")
+_STRING_COLUMNS = ["iso_code", "continent", "location"]
+_FLOAT_COLUMNS = [
+    "total_cases", "new_cases",
+    "total_deaths", "new_deaths",
+    "total_cases_per_million",
+    "new_cases_per_million",
+    "total_deaths_per_million",
+]
+DEATHS_COLUMNS = _STRING_COLUMNS + ["date"] + _FLOAT_COLUMNS
+_SAMPLE_BYTES = 1 << 20
+_logger = logging.getLogger(__name__)
+
+
+def _check_engine(engine: str) -> None:
+    if engine not in ENGINES:
+        raise ValueError(f"Invalid CSV engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    if engine == "pyarrow" and pa_csv is None:
+        raise ValueError("The pyarrow CSV engine requires pyarrow to be installed")
+
+
+def _source(path: str, offset: int):
+    if not offset:
+        return path
+    with open(path, "rb") as file:
+        header = file.readline()
+        file.seek(offset)
+        return io.BytesIO(header + file.read())
+
+
+def _row_bytes(path: str) -> int:
+    with open(path, "rb") as file:
+        sample = file.read(_SAMPLE_BYTES)
+    return max(1, len(sample) // max(1, sample.count(b"\n")))
+
+
+def _pandas_chunks(source, *, engine: str, chunk_rows: int | None, strict: bool):
+    dtype = {column: "str" for column in _STRING_COLUMNS}
+    dtype.update({column: "float64" if strict else "str" for column in _FLOAT_COLUMNS})
+    options = {"usecols": DEATHS_COLUMNS, "dtype": dtype, "parse_dates": ["date"]}
+    if engine == "c":
+        options["date_format"] = "ISO8601"
+    if chunk_rows is None:
+        return [pd.read_csv(source, engine=engine, **options)]
+    return pd.read_csv(source, engine=engine, chunksize=chunk_rows, **options)
+
+
+def _arrow_chunks(source, path: str, *, chunk_rows: int, strict: bool):
+    column_types = {column: pa.string() for column in _STRING_COLUMNS}
+    column_types.update({column: pa.float64() if strict else pa.string() for column in _FLOAT_COLUMNS})
+    column_types["date"] = pa.timestamp("ns")
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=max(1 << 16, _row_bytes(path) * chunk_rows)),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=DEATHS_COLUMNS, column_types=column_types, strings_can_be_null=True
+        ),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def _chunks(path: str, *, offset: int, engine: str, chunk_rows: int | None, strict: bool):
+    source = _source(path, offset)
+    if engine == "pyarrow" and chunk_rows is not None:
+        return _arrow_chunks(source, path, chunk_rows=chunk_rows, strict=strict)
+    return _pandas_chunks(source, engine=engine, chunk_rows=chunk_rows, strict=strict)
+
+
+def _normalize(frame: pd.DataFrame, coerce: bool) -> pd.DataFrame:
+    if coerce:
+        frame = frame.assign(**{column: pd.to_numeric(frame[column], errors="coerce") for column in _FLOAT_COLUMNS})
+    if not pd.api.types.is_datetime64_any_dtype(frame.date):
+        frame = frame.assign(date=pd.to_datetime(frame.date))
+    return frame[DEATHS_COLUMNS]
+
+
+def _timed(chunks, *, coerce: bool = False):
+    chunks = iter(chunks)
+    while True:
+        with span("ingest.deaths") as stage:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            chunk = _normalize(chunk, coerce)
+            stage.rows = chunk.shape[0]
+        yield chunk
+
+
+def iter_deaths(path: str, *, offset: int = 0, engine: str = "c", chunk_rows: int | None = None):
+    _check_engine(engine)
+    yielded = 0
+    try:
+        for chunk in _timed(_chunks(path, offset=offset, engine=engine, chunk_rows=chunk_rows, strict=True)):
+            yield chunk
+            yielded += 1
+    except ValueError:
+        _logger.warning("Non-numeric values in %s, reading them as missing", path)
+        chunks = _chunks(path, offset=offset, engine=engine, chunk_rows=chunk_rows, strict=False)
+        for position, chunk in enumerate(_timed(chunks, coerce=True)):
+            if position >= yielded:
+                yield chunk
+                yielded += 1
+    if not yielded:
+        yield pd.DataFrame({column: pd.Series(dtype="float64") for column in DEATHS_COLUMNS}).astype(
+            {**{column: "str" for column in _STRING_COLUMNS}, "date": "datetime64[ns]"}
+        )
+
+
+def read_gdp(path: str, *, engine: str = "c") -> pd.DataFrame:
+    _check_engine(engine)
+    with span("ingest.gdp") as stage:
+        gdp = pd.read_csv(path, engine=engine, dtype="str")
+        stage.rows = gdp.shape[0]
+    return gdp
+
+
+def read_gdp2(path: str, *, engine: str = "c") -> pd.DataFrame:
+    _check_engine(engine)
+    columns = pd.read_csv(path, nrows=0).columns
+    with span("ingest.gdp2") as stage:
+        try:
+            gdp2 = pd.read_csv(
+                path, engine=engine, dtype={column: "str" if column == "Country" else "float64" for column in columns}
+            )
+        except ValueError:
+            _logger.warning("Non-numeric values in %s, reading them as missing", path)
+            gdp2 = pd.read_csv(path, engine=engine, dtype="str")
+            gdp2 = gdp2.assign(**{
+                column: pd.to_numeric(gdp2[column], errors="coerce") for column in columns if column != "Country"
+            })
+        stage.rows = gdp2.shape[0]
+    return gdp2
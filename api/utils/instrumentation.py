@@ -0,0 +1,84 @@
+import contextvars
+import cProfile
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+
+from fastapi.routing import APIRoute
+
+from .metrics import REQUEST_SECONDS, RESPONSE_BYTES
+
+__all__ = ("MetricsMiddleware", "InstrumentedRoute")
+
+_profile = contextvars.ContextVar("profile", default=None)
+_profile_lock = threading.Lock()
+
+
+def _profiled(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with _profile_lock:
+            return profile.runcall(endpoint, *args, **kwargs)
+    return wrapper
+
+
+class InstrumentedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+class MetricsMiddleware:
+    def __init__(self, app, *, profile_dir: str | None = None):
+        self.app = app
+        self.profile_dir = profile_dir
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def _profile_path(self, scope) -> str | None:
+        if self.profile_dir is None:
+            return None
+        requested = dict(scope["headers"]).get(b"x-profile", b"")
+        if requested in (b"", b"0", b"false"):
+            return None
+        name = re.sub(r"\W+", "_", scope["path"]).strip("_") or "root"
+        return os.path.join(self.profile_dir, f"{time.time_ns()}-{name}.prof")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = {"status": 500, "bytes": 0}
+        profile_path = self._profile_path(scope)
+        profile = cProfile.Profile() if profile_path is not None else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if profile is not None:
+                    headers = [*message.get("headers", []), (b"x-profile-path", profile_path.encode())]
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        token = _profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route, str(state["status"]))
+            RESPONSE_BYTES.observe(state["bytes"], scope["method"], route)
+            if profile is not None:
+                profile.dump_stats(profile_path)
@@ -0,0 +1,34 @@
+import threading
+from collections import OrderedDict
+
+__all__ = ("VersionedCache",)
+
+
+class VersionedCache:
+    def __init__(self, maxsize: int = 128):
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+
+    def get(self, version, key, compute):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries.clear()
+            elif key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = compute()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = value
+                if len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._entries.clear()
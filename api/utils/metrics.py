@@ -0,0 +1,113 @@
+import bisect
+import contextlib
+import math
+import threading
+import time
+
+__all__ = (
+    "Histogram",
+    "REQUEST_SECONDS",
+    "RESPONSE_BYTES",
+    "STAGE_SECONDS",
+    "STAGE_ROWS",
+    "STAGE_BYTES",
+    "span",
+    "render_metrics",
+)
+
+_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_SIZE_BUCKETS = tuple(10.0 ** exponent for exponent in range(1, 11))
+_histograms = []
+
+
+def _format(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: list) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+        _histograms.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in series:
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', _format(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_format(total)}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests.",
+    ("method", "route", "status"), _SECONDS_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Size of HTTP response bodies.",
+    ("method", "route"), _SIZE_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Time spent in internal processing stages.",
+    ("stage",), _SECONDS_BUCKETS
+)
+STAGE_ROWS = Histogram(
+    "stage_rows", "Rows produced by internal processing stages.",
+    ("stage",), _SIZE_BUCKETS
+)
+STAGE_BYTES = Histogram(
+    "stage_bytes", "Bytes read or written by internal processing stages.",
+    ("stage",), _SIZE_BUCKETS
+)
+
+
+class _Span:
+    __slots__ = ("rows", "bytes")
+
+    def __init__(self):
+        self.rows = None
+        self.bytes = None
+
+
+@contextlib.contextmanager
+def span(stage: str):
+    record = _Span()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+        if record.rows is not None:
+            STAGE_ROWS.observe(record.rows, stage)
+        if record.bytes is not None:
+            STAGE_BYTES.observe(record.bytes, stage)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for histogram in _histograms for line in histogram.render()) + "\n"
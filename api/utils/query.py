@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+__all__ = ("select_rows", "parse_cursor", "format_cursor")
+
+
+def parse_cursor(cursor: str) -> tuple:
+    date, _, label = cursor.partition("-")
+    label, _, generation = label.partition("-")
+    try:
+        return np.datetime64(int(date), "ns"), int(label), generation or None
+    except ValueError:
+        raise ValueError(f"Invalid cursor {cursor!r}") from None
+
+
+def format_cursor(date: np.datetime64, label: int, generation: str = None) -> str:
+    cursor = f"{date.astype('datetime64[ns]').astype('int64')}-{label}"
+    return f"{cursor}-{generation}" if generation else cursor
+
+
+def _skip_to(frame: pd.DataFrame, after: tuple) -> pd.DataFrame:
+    date, label = after[:2]
+    dates = frame.date.to_numpy()
+    date = date.astype(dates.dtype)
+    lo = np.searchsorted(dates, date, side="left")
+    hi = np.searchsorted(dates, date, side="right")
+    return frame.iloc[lo + np.searchsorted(frame.index[lo:hi].to_numpy(), label, side="right"):]
+
+
+def select_rows(
+    frame: pd.DataFrame,
+    *,
+    columns: list = None,
+    iso_codes: list = None,
+    continents: list = None,
+    after: tuple = None,
+    limit: int = None,
+    label_generation=None
+) -> tuple:
+    if columns is not None:
+        unknown = [column for column in columns if column not in frame.columns]
+        if unknown or not columns:
+            raise ValueError(f"Invalid columns {unknown or columns!r}, expected some of {', '.join(frame.columns)}")
+    if after is not None:
+        frame = _skip_to(frame, after)
+
+    mask = None
+    for column, values in (("iso_code", iso_codes), ("continent", continents)):
+        if values:
+            matches = frame[column].isin(values).to_numpy()
+            mask = matches if mask is None else mask & matches
+
+    if mask is None:
+        positions = slice(0, frame.shape[0] if limit is None else limit)
+        more = limit is not None and frame.shape[0] > limit
+        last = limit - 1 if more else None
+    else:
+        positions = np.flatnonzero(mask)
+        more = limit is not None and positions.shape[0] > limit
+        positions = positions[:limit]
+        last = positions[-1] if more else None
+
+    cursor = None
+    if more:
+        label = int(frame.index[last])
+        cursor = format_cursor(frame.date.to_numpy()[last], label, label_generation and label_generation(label))
+    if columns is not None:
+        return frame.iloc[positions, frame.columns.get_indexer(list(columns))], cursor
+    return frame.iloc[positions], cursor
@@ -0,0 +1,71 @@
+import contextlib
+import logging
+import threading
+import time
+
+__all__ = ("Readiness",)
+
+_logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self, stages: tuple):
+        self._stages = tuple(stages)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stage = None
+        self._completed = 0
+        self._started = None
+        self._finished = None
+        self._error = None
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def start(self, target) -> None:
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(target,), name="dataset-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self, target) -> None:
+        try:
+            target()
+        except Exception as e:
+            _logger.exception("Loading the dataset failed")
+            with self._lock:
+                self._error = f"{type(e).__name__}: {e}"
+                self._finished = time.monotonic()
+        else:
+            with self._lock:
+                self._stage = None
+                self._finished = time.monotonic()
+            self._ready.set()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            self._stage = name
+        yield
+        with self._lock:
+            self._completed += 1
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict:
+        with self._lock:
+            end = self._finished if self._finished is not None else time.monotonic()
+            return {
+                "status": "ready" if self.ready else "failed" if self._error is not None else "loading",
+                "stage": self._stage,
+                "progress": round(self._completed / len(self._stages), 3) if self._stages else 1.0,
+                "stages": list(self._stages),
+                "elapsed": round(end - self._started, 3) if self._started is not None else 0.0,
+                "error": self._error,
+            }
@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import os
+import threading
+
+__all__ = ("FileWatcher",)
+
+_logger = logging.getLogger(__name__)
+_TAIL_SIZE = 1 << 12
+
+
+def _digest(content: bytes) -> bytes:
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+def _file_state(path: str) -> tuple | None:
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as file:
+            file.seek(max(0, stat.st_size - _TAIL_SIZE))
+            tail = file.read(_TAIL_SIZE)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, _digest(tail), tail.endswith(b"\n")
+
+
+def _appended_from(path: str, old: tuple, new: tuple) -> int | None:
+    size, _, digest, line_complete = old
+    if new[0] <= size or not line_complete:
+        return None
+    with open(path, "rb") as file:
+        file.seek(max(0, size - _TAIL_SIZE))
+        tail = file.read(min(size, _TAIL_SIZE))
+    return size if _digest(tail) == digest else None
+
+
+class FileWatcher:
+    def __init__(self, paths: list, callback, *, interval: float = 5.0):
+        self._paths = list(paths)
+        self._callback = callback
+        self._interval = interval
+        self._states = {path: _file_state(path) for path in self._paths}
+        self._pending = None
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._watch, name="source-watcher", daemon=True)
+        self._thread.start()
+
+    def _watch(self) -> None:
+        while not self._closed.wait(self._interval):
+            self.poll()
+
+    def poll(self) -> None:
+        states = {path: _file_state(path) for path in self._paths}
+        changed = [path for path in self._paths if states[path] != self._states[path]]
+        if not changed or any(state is None for state in states.values()):
+            self._pending = None
+            return
+        if states != self._pending:
+            self._pending = states
+            return
+
+        changes = {
+            path: None if self._states[path] is None else _appended_from(path, self._states[path], states[path])
+            for path in changed
+        }
+        try:
+            self._callback(changes)
+        except Exception:
+            _logger.exception("Reloading %s failed", ", ".join(changed))
+        self._states = states
+        self._pending = None
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
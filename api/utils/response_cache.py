@@ -0,0 +1,132 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+from .metrics import span
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ("ResponseCache", "CachedBody", "ENCODINGS", "negotiate_encoding")
+
+ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+_MIN_COMPRESS_BYTES = 1024
+_GZIP_LEVEL = 5
+_ZSTD_LEVEL = 3
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, *params = part.split(";")
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0)
+
+
+class CachedBody:
+    def __init__(self, key, body: bytes, media_type: str, headers: dict):
+        self.key = key
+        self.media_type = media_type
+        self.headers = dict(headers)
+        self.variants = {None: body}
+        self.size = len(body)
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = 256 << 20, max_entry_bytes: int = None):
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = min(max_bytes, max_entry_bytes or max_bytes // 16)
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def max_entry_bytes(self) -> int:
+        return self._max_entry_bytes
+
+    def get(self, version, key) -> CachedBody | None:
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, version, key, body: bytes, media_type: str, headers: dict) -> CachedBody:
+        entry = CachedBody(key, body, media_type, headers)
+        with self._lock:
+            if version == self._version and entry.size <= self._max_entry_bytes:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._size -= previous.size
+                self._entries[key] = entry
+                self._size += entry.size
+                self._evict()
+        return entry
+
+    def body(self, entry: CachedBody, encoding: str | None) -> tuple:
+        identity = entry.variants[None]
+        if encoding is None or len(identity) < _MIN_COMPRESS_BYTES:
+            return identity, None
+        content = entry.variants.get(encoding)
+        if content is not None:
+            return content, encoding
+
+        with span(f"compress.{encoding}") as stage:
+            content = _compress(identity, encoding)
+            stage.bytes = len(content)
+        with self._lock:
+            if encoding not in entry.variants:
+                entry.variants[encoding] = content
+                entry.size += len(content)
+                if self._entries.get(entry.key) is entry:
+                    self._size += len(content)
+                    self._evict()
+        return content, encoding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(None)
+
+    def _reset(self, version) -> None:
+        self._version = version
+        self._entries.clear()
+        self._size = 0
+
+    def _evict(self) -> None:
+        while self._size > self._max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
@@ -0,0 +1,153 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+__all__ = ("CUBES", "ROLLUP_METRICS", "ROLLUP_REDUCERS", "Rollup", "RollupCubes")
+
+CUBES = {
+    "country-month": ("iso_code", "month"),
+    "continent-month": ("continent", "month"),
+    "country-year": ("iso_code", "year"),
+}
+ROLLUP_METRICS = (
+    "new_cases",
+    "new_deaths",
+    "total_cases",
+    "total_deaths",
+    "total_cases_per_million",
+    "total_deaths_per_million",
+    "deaths_by_cases",
+)
+ROLLUP_REDUCERS = ("mean", "sum", "max", "count")
+_BULK_ROWS = 4096
+
+
+def _grow(array: np.ndarray, shape: tuple, fill) -> np.ndarray:
+    if array.shape[0] >= shape[0] and array.shape[1] >= shape[1]:
+        return array
+    capacity = tuple(
+        max(needed, current * 2) if needed > current else current
+        for needed, current in zip(shape, array.shape[:2])
+    ) + array.shape[2:]
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:array.shape[0], :array.shape[1]] = array
+    return grown
+
+
+class Rollup:
+    def __init__(self, key_column: str, period: str, metrics: tuple = ROLLUP_METRICS):
+        self.key_column = key_column
+        self.period = period
+        self.metrics = tuple(metrics)
+        self.period_columns = ["year", "month"] if period == "month" else ["year"]
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._buckets = {}
+        self._sums = np.zeros((0, 0, len(self.metrics)), dtype="float64")
+        self._counts = np.zeros((0, 0, len(self.metrics)), dtype="int64")
+        self._maxima = np.full((0, 0, len(self.metrics)), -np.inf, dtype="float64")
+
+    def _bucket(self, dates: pd.Series) -> np.ndarray:
+        if self.period == "month":
+            return dates.dt.year.to_numpy("int64") * 12 + dates.dt.month.to_numpy("int64") - 1
+        return dates.dt.year.to_numpy("int64")
+
+    @staticmethod
+    def _slots(values: np.ndarray, slots: dict) -> np.ndarray:
+        codes, uniques = pd.factorize(values)
+        lookup = np.fromiter(
+            (slots.setdefault(value, len(slots)) for value in uniques), dtype="int64", count=len(uniques)
+        )
+        return lookup[codes]
+
+    def update(self, frame: pd.DataFrame) -> None:
+        frame = frame.loc[frame[self.key_column].notna() & frame.date.notna()]
+        if not frame.shape[0]:
+            return
+        values = frame[list(self.metrics)].to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnan(values)
+
+        with self._lock:
+            keys = self._slots(frame[self.key_column].to_numpy(), self._keys)
+            buckets = self._slots(self._bucket(frame.date), self._buckets)
+            shape = (len(self._keys), len(self._buckets))
+            self._sums = _grow(self._sums, shape, 0.0)
+            self._counts = _grow(self._counts, shape, 0)
+            self._maxima = _grow(self._maxima, shape, -np.inf)
+
+            if frame.shape[0] < _BULK_ROWS:
+                np.add.at(self._sums, (keys, buckets), np.where(valid, values, 0.0))
+                np.add.at(self._counts, (keys, buckets), valid)
+                np.maximum.at(self._maxima, (keys, buckets), np.where(valid, values, -np.inf))
+            else:
+                self._accumulate(keys * self._sums.shape[1] + buckets, values, valid)
+
+    def _accumulate(self, cells: np.ndarray, values: np.ndarray, valid: np.ndarray) -> None:
+        width = len(self.metrics)
+        sums, counts, maxima = (array.reshape(-1, width) for array in (self._sums, self._counts, self._maxima))
+        for column in range(width):
+            present = valid[:, column]
+            sums[:, column] += np.bincount(
+                cells, weights=np.where(present, values[:, column], 0.0), minlength=sums.shape[0]
+            )
+            counts[:, column] += np.bincount(cells[present], minlength=counts.shape[0])
+
+        order = np.argsort(cells)
+        cells = cells[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        cells = cells[starts]
+        values = np.take(np.where(valid, values, -np.inf), order, axis=0)
+        maxima[cells] = np.maximum(maxima[cells], np.maximum.reduceat(values, starts, axis=0))
+
+    def query(self, *, metrics: list, reducer: str = "mean", keys: list = None) -> pd.DataFrame:
+        if reducer not in ROLLUP_REDUCERS:
+            raise ValueError(f"Invalid reducer {reducer!r}, expected one of {', '.join(ROLLUP_REDUCERS)}")
+        if not metrics or any(metric not in self.metrics for metric in metrics):
+            raise ValueError(f"Invalid metrics {list(metrics)!r}, expected some of {', '.join(self.metrics)}")
+        columns = [self.metrics.index(metric) for metric in metrics]
+
+        with self._lock:
+            names = list(self._keys) if keys is None else [key for key in keys if key in self._keys]
+            rows = np.asarray([self._keys[name] for name in names], dtype="int64")
+            buckets = np.fromiter(self._buckets, dtype="int64", count=len(self._buckets))
+            sums = self._sums[rows][:, :buckets.shape[0]][..., columns]
+            counts = self._counts[rows][:, :buckets.shape[0]][..., columns]
+            maxima = self._maxima[rows][:, :buckets.shape[0]][..., columns]
+
+        if reducer == "sum":
+            values = sums
+        elif reducer == "count":
+            values = counts
+        elif reducer == "max":
+            values = np.where(counts > 0, maxima, np.nan)
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+        key_index, bucket_index = np.nonzero(counts.sum(axis=2) > 0)
+        result = {self.key_column: np.asarray(names, dtype=object)[key_index]}
+        bucket_values = buckets[bucket_index]
+        if self.period == "month":
+            result["year"] = bucket_values // 12
+            result["month"] = bucket_values % 12 + 1
+        else:
+            result["year"] = bucket_values
+        for i, metric in enumerate(metrics):
+            result[metric] = values[key_index, bucket_index, i]
+
+        return pd.DataFrame(result).sort_values([self.key_column, *self.period_columns], ignore_index=True)
+
+
+class RollupCubes:
+    def __init__(self, frame: pd.DataFrame = None):
+        self.cubes = {name: Rollup(key_column, period) for name, (key_column, period) in CUBES.items()}
+        if frame is not None:
+            self.update(frame)
+
+    def update(self, frame: pd.DataFrame) -> None:
+        for cube in self.cubes.values():
+            cube.update(frame)
+
+    def __getitem__(self, name: str) -> Rollup:
+        return self.cubes[name]
@@ -0,0 +1,120 @@
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+__all__ = (
+    "FORMATS",
+    "MEDIA_TYPES",
+    "STREAMING_FORMATS",
+    "negotiate_format",
+    "encode_frame",
+    "iter_encoded_frame",
+    "UnsupportedFormat",
+)
+
+MEDIA_TYPES = {
+    "dict": "application/json",
+    "split": "application/vnd.pandas.split+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "ndjson": "application/x-ndjson",
+}
+FORMATS = tuple(MEDIA_TYPES)
+STREAMING_FORMATS = ("arrow", "ndjson")
+_ARROW_FORMATS = ("arrow", "parquet")
+_ACCEPT_ALIASES = {
+    "application/x-parquet": "parquet",
+    "application/jsonl": "ndjson",
+}
+_SCHEMA_SAMPLE_ROWS = 1000
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def _accepted_formats(accept: str) -> list:
+    formats = []
+    for part in accept.split(","):
+        media_type, *parameters = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            if parameter.startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        for name, known_type in MEDIA_TYPES.items():
+            if media_type == known_type:
+                formats.append((quality, name))
+        if media_type in _ACCEPT_ALIASES:
+            formats.append((quality, _ACCEPT_ALIASES[media_type]))
+    formats.sort(key=lambda item: -item[0])
+    return [name for quality, name in formats if quality > 0]
+
+
+def negotiate_format(data_format: str = None, accept: str = None) -> str:
+    if data_format is not None:
+        if data_format not in MEDIA_TYPES:
+            raise UnsupportedFormat(f"Unknown format {data_format!r}, expected one of {', '.join(FORMATS)}")
+        if data_format in _ARROW_FORMATS and pa is None:
+            raise UnsupportedFormat(f"Format {data_format!r} requires pyarrow")
+        return data_format
+    for name in _accepted_formats(accept or ""):
+        if name not in _ARROW_FORMATS or pa is not None:
+            return name
+    return "dict"
+
+
+def _arrow_schema(frame: pd.DataFrame):
+    schema = pa.Schema.from_pandas(frame.iloc[:_SCHEMA_SAMPLE_ROWS], preserve_index=True)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+
+def _iter_arrow(frame: pd.DataFrame, chunk_rows: int):
+    schema = _arrow_schema(frame)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for start in range(0, frame.shape[0], chunk_rows):
+            chunk = frame.iloc[start:start + chunk_rows]
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=True))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def _iter_ndjson(frame: pd.DataFrame, chunk_rows: int):
+    for start in range(0, frame.shape[0], chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        yield chunk.to_json(orient="records", lines=True, date_format="iso", date_unit="s", double_precision=15).encode()
+
+
+def iter_encoded_frame(frame: pd.DataFrame, data_format: str, *, chunk_rows: int = 50_000):
+    if data_format == "arrow":
+        return _iter_arrow(frame, chunk_rows)
+    if data_format == "ndjson":
+        return _iter_ndjson(frame, chunk_rows)
+    raise UnsupportedFormat(f"Format {data_format!r} can't be streamed, expected one of {', '.join(STREAMING_FORMATS)}")
+
+
+def encode_frame(frame: pd.DataFrame, data_format: str) -> tuple:
+    if data_format == "split":
+        content = frame.to_json(orient="split", date_format="iso", date_unit="s", double_precision=15).encode()
+    elif data_format in STREAMING_FORMATS:
+        content = b"".join(iter_encoded_frame(frame, data_format, chunk_rows=max(frame.shape[0], 1)))
+    elif data_format == "parquet":
+        sink = io.BytesIO()
+        frame.to_parquet(sink, engine="pyarrow", index=True)
+        content = sink.getvalue()
+    else:
+        raise UnsupportedFormat(f"Format {data_format!r} is not a binary or split encoding")
+    return content, MEDIA_TYPES[data_format]
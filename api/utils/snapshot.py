@@ -0,0 +1,32 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .data import concat_frames
+
+__all__ = ("LatestObservations",)
+
+
+def _last_per_country(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.loc[frame.iso_code.notna()]
+    frame = frame.take(np.argsort(frame.date.to_numpy(), kind="stable"))
+    return frame.drop_duplicates("iso_code", keep="last")
+
+
+class LatestObservations:
+    def __init__(self, frame: pd.DataFrame = None):
+        self._lock = threading.Lock()
+        self._rows = None
+        if frame is not None:
+            self.update(frame)
+
+    def update(self, frame: pd.DataFrame) -> None:
+        latest = _last_per_country(frame)
+        with self._lock:
+            if self._rows is not None:
+                latest = _last_per_country(concat_frames([self._rows, latest]))
+            self._rows = latest.sort_values("iso_code", kind="stable")
+
+    def snapshot(self) -> pd.DataFrame:
+        return self._rows
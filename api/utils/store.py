@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import secrets
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .data import apply_schema, concat_frames, schema_violations
+
+__all__ = ("DeathsStore", "derive_generation")
+
+_logger = logging.getLogger(__name__)
+
+
+def derive_generation(*parts) -> str:
+    return hashlib.blake2b(json.dumps(parts, default=str).encode(), digest_size=8).hexdigest()
+
+
+class DeathsStore:
+    def __init__(
+        self,
+        frame: pd.DataFrame,
+        *,
+        compact_rows: int = 1024,
+        compact_ratio: float = 0.01,
+        version: int = 0,
+        generation: str = None
+    ):
+        if not frame.date.is_monotonic_increasing:
+            frame = frame.sort_values("date", kind="stable")
+        self._lock = threading.Lock()
+        self._compact_rows = compact_rows
+        self._compact_ratio = compact_ratio
+        self._version = version
+        self._generation = generation or secrets.token_hex(8)
+        self._local_generation = derive_generation(self._generation, secrets.token_hex(8))
+        self._shared_end = None
+        self._listeners = []
+        self._base = frame
+        self._base_dates = frame.date.to_numpy()
+        self._base_end = int(frame.index.max()) + 1 if frame.shape[0] else 0
+        side = frame.iloc[:0]
+        self._state = (side, side.date.to_numpy(), (), 0, self._base_end, self._generation)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        side, _, runs, _, _, _ = self._state
+        if not side.shape[0] and not runs:
+            return self._base
+        return _merge_sorted(self._base, self._base_dates, concat_frames([side, *runs]))
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def generation(self) -> str:
+        return self._state[5]
+
+    @property
+    def etag(self) -> str:
+        return _etag(self._state)
+
+    def resolve_since(self, tag: str) -> int | None:
+        generation, _, watermark = tag.strip().removeprefix("W/").strip('"').partition("-")
+        watermark = watermark.partition("-")[0]
+        if not watermark.isdigit() or not self._is_shared(generation, int(watermark) - 1):
+            return None
+        return int(watermark)
+
+    def label_generation(self, label: int) -> str:
+        if self._shared_end is None or label < self._shared_end:
+            return self._generation
+        return self._local_generation
+
+    def resolve_cursor(self, cursor: tuple) -> tuple:
+        date, label, generation = cursor
+        if generation is not None and not self._is_shared(generation, label):
+            raise ValueError("Cursor was issued for a different view of the data, restart pagination")
+        return date, label
+
+    def _is_shared(self, generation: str, label: int) -> bool:
+        if generation == self._state[5]:
+            return True
+        return generation == self._generation and (self._shared_end is None or label < self._shared_end)
+
+    @property
+    def pending_rows(self) -> int:
+        return self._state[3]
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, rows: pd.DataFrame) -> None:
+        for listener in self._listeners:
+            listener(rows)
+
+    def window(self, start, end, *, since: int = None) -> pd.DataFrame:
+        return self._window(self._state, start, end, since)
+
+    def tagged_window(self, start, end, *, since: int = None) -> tuple:
+        state = self._state
+        return self._window(state, start, end, since), _etag(state)
+
+    def _window(self, state: tuple, start, end, since: int = None) -> pd.DataFrame:
+        side, side_dates, runs, _, next_label, _ = state
+        dates = self._base_dates
+        start = _to_datetime64(start, dates.dtype)
+        end = _to_datetime64(end, dates.dtype)
+        lo, hi = np.searchsorted(dates, start, side="left"), np.searchsorted(dates, end, side="right")
+        if since is not None and since >= self._base_end:
+            lo = hi
+        data = self._base.iloc[lo:hi]
+        if since is not None and lo < hi:
+            data = data.loc[data.index >= since]
+        if since is not None and since >= next_label:
+            return data
+
+        extra = side.iloc[np.searchsorted(side_dates, start, side="left"):np.searchsorted(side_dates, end, side="right")]
+        if since is not None:
+            extra = extra.loc[extra.index >= since]
+        extra = [extra] if extra.shape[0] else []
+        for run in runs:
+            run_dates = run.date.to_numpy()
+            mask = (run_dates >= start) & (run_dates <= end) & (run.index.to_numpy() >= (since or 0))
+            if mask.any():
+                extra.append(run.loc[mask])
+        if not extra:
+            return data
+        return _merge_sorted(data, data.date.to_numpy(), concat_frames(extra))
+
+    def prepare(self, records: list, *, skip_invalid: bool = False) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(list(records))
+        return _conform(frame, self._base_dates.dtype, skip_invalid=skip_invalid)
+
+    def append(self, rows: pd.DataFrame) -> None:
+        if not rows.shape[0]:
+            return
+        with self._lock:
+            side, side_dates, runs, pending_rows, next_label, _ = self._state
+            if self._shared_end is None:
+                self._shared_end = next_label
+            rows = rows.set_axis(pd.RangeIndex(rows.shape[0]) + next_label)
+            self._notify(rows)
+            runs = _push_run(runs, rows)
+            pending_rows += rows.shape[0]
+            self._state = (side, side_dates, runs, pending_rows, next_label + rows.shape[0], self._local_generation)
+            self._version += 1
+            if pending_rows >= max(self._compact_rows, int(side.shape[0] * self._compact_ratio)):
+                self._compact()
+
+    def extend(self, rows: pd.DataFrame) -> None:
+        if not rows.shape[0]:
+            return
+        with self._lock:
+            rows = _conform(rows, self._base_dates.dtype, skip_invalid=True)
+            if not rows.shape[0]:
+                return
+            side, side_dates, runs, _, next_label, _ = self._state
+            rows = rows.set_axis(pd.RangeIndex(rows.shape[0]) + next_label)
+            self._merge(side, side_dates, concat_frames([*runs, rows]))
+            self._notify(rows)
+            self._version += 1
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        side, side_dates, runs, _, _, _ = self._state
+        if runs:
+            self._merge(side, side_dates, concat_frames(list(runs)))
+
+    def _merge(self, side: pd.DataFrame, side_dates: np.ndarray, rows: pd.DataFrame) -> None:
+        side = _merge_sorted(side, side_dates, rows)
+        self._state = (side, side.date.to_numpy(), (), 0, int(rows.index.max()) + 1, self._state[5])
+
+
+def _etag(state: tuple) -> str:
+    return f'"{state[5]}-{state[4]}"'
+
+
+def _push_run(runs: tuple, rows: pd.DataFrame) -> tuple:
+    while runs and runs[-1].shape[0] <= rows.shape[0]:
+        rows = concat_frames([runs[-1], rows])
+        runs = runs[:-1]
+    return runs + (rows,)
+
+
+def _merge_sorted(frame: pd.DataFrame, dates: np.ndarray, rows: pd.DataFrame) -> pd.DataFrame:
+    rows = rows.take(np.argsort(rows.date.to_numpy(), kind="stable"))
+    positions = np.searchsorted(dates, rows.date.to_numpy(), side="right")
+    order = np.insert(np.arange(frame.shape[0]), positions, np.arange(rows.shape[0]) + frame.shape[0])
+    return concat_frames([frame, rows]).take(order)
+
+
+def _conform(rows: pd.DataFrame, dtype: np.dtype, *, skip_invalid: bool) -> pd.DataFrame:
+    rows = _normalize_dates(rows, dtype)
+    violations = schema_violations(rows)
+    invalid = violations.any(axis=1).to_numpy()
+    if invalid.any():
+        columns = ", ".join(violations.columns[violations.any(axis=0).to_numpy()])
+        if not skip_invalid:
+            raise ValueError(f"Values out of range for columns {columns}")
+        _logger.warning("Skipping %d rows with values out of range for columns %s", int(invalid.sum()), columns)
+        rows = rows.loc[~invalid]
+    return apply_schema(rows)
+
+
+def _normalize_dates(rows: pd.DataFrame, dtype: np.dtype) -> pd.DataFrame:
+    if "date" not in rows.columns:
+        return rows.assign(date=pd.Series(pd.NaT, index=rows.index, dtype=dtype))
+    dates = pd.to_datetime(rows.date, errors="coerce")
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    return rows.assign(date=dates.astype(dtype))
+
+
+def _to_datetime64(value, dtype: np.dtype) -> np.datetime64:
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert(None)
+    return np.datetime64(value).astype(dtype)
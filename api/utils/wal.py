@@ -0,0 +1,331 @@
+import contextlib
+import datetime
+import fcntl
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from .cache import read_frame, read_frame_key, write_frame
+from .locking import file_lock, is_locked
+
+try:
+    import pyarrow.json as pa_json
+except ImportError:
+    pa_json = None
+
+__all__ = ("WriteAheadLog",)
+
+_SEGMENT_PATTERN = re.compile(r"^segment-(\d+)\.ndjson$")
+_SNAPSHOT_DIRNAME = "snapshot"
+_COMPACT_LOCK_FILENAME = "compact.lock"
+_REJECTED_FILENAME = "rejected.ndjson"
+_logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _fsync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_tree(directory: str) -> None:
+    for filename in os.listdir(directory):
+        with open(os.path.join(directory, filename), "rb") as file:
+            os.fsync(file.fileno())
+    _fsync_directory(directory)
+
+
+def _parse_each_line(content: bytes) -> tuple:
+    records, rejected = [], []
+    for line in content.splitlines(keepends=True):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            records.append(record)
+        else:
+            rejected.append(line)
+    frame = pd.DataFrame.from_records(records)
+    if "date" in frame.columns:
+        frame["date"] = pd.to_datetime(frame.date, errors="coerce")
+    return frame, rejected
+
+
+def _parse_lines(content: bytes) -> tuple:
+    if not content:
+        return pd.DataFrame(), []
+    try:
+        if pa_json is not None:
+            return pa_json.read_json(io.BytesIO(content)).to_pandas(), []
+        return pd.read_json(io.BytesIO(content), lines=True, convert_dates=["date"]), []
+    except ValueError:
+        frame, rejected = _parse_each_line(content)
+        _logger.warning("Skipping %d unparseable lines in the write-ahead log", len(rejected))
+        return frame, rejected
+
+
+def _read_lines(file, offset: int) -> tuple:
+    file.seek(offset)
+    content = file.read()
+    content = content[:content.rfind(b"\n") + 1]
+    frame, rejected = _parse_lines(content)
+    return frame, offset + len(content), rejected
+
+
+def _read_segment(path: str) -> tuple:
+    with open(path, "rb") as file:
+        return _read_lines(file, 0)
+
+
+def _parse_snapshot_key(key: str | None) -> tuple:
+    if key is None:
+        return 0, frozenset()
+    if key.isdigit():
+        return int(key), frozenset(range(int(key) + 1))
+    key = json.loads(key)
+    return key["last"], frozenset(key["segments"])
+
+
+class WriteAheadLog:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        fsync_interval: float = 1.0,
+        compact_rows: int = 100_000,
+        fold_delay: float = 30.0
+    ):
+        self._directory = directory
+        self._fsync_interval = fsync_interval
+        self._compact_rows = compact_rows
+        self._fold_delay = fold_delay
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._tail_lock = threading.Lock()
+        self._buffer = []
+        self._segment_rows = 0
+        self._deferred_folds = 0
+        self._own_segments = set()
+        self._readers = {}
+        self._closed = threading.Event()
+        self._threads = []
+
+        os.makedirs(directory, exist_ok=True)
+        self._segment, self._file = self._open_segment()
+
+        if fsync_interval > 0:
+            self._start_thread(self._flush_periodically, "wal-flusher")
+
+    def _start_thread(self, target, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _open_segment(self) -> tuple:
+        segment = max(self._segments() + [self._snapshot_state()[0]]) + 1
+        while True:
+            try:
+                fd = os.open(self._segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+                break
+            except FileExistsError:
+                segment += 1
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        self._own_segments.add(segment)
+        return segment, os.fdopen(fd, "ab")
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._directory, f"segment-{segment}.ndjson")
+
+    def _segments(self) -> list:
+        segments = []
+        for filename in os.listdir(self._directory):
+            match = _SEGMENT_PATTERN.match(filename)
+            if match:
+                segments.append(int(match.group(1)))
+        return sorted(segments)
+
+    def _snapshot_state(self) -> tuple:
+        return _parse_snapshot_key(read_frame_key(os.path.join(self._directory, _SNAPSHOT_DIRNAME)))
+
+    def _compaction_lock(self, **kwargs):
+        return file_lock(os.path.join(self._directory, _COMPACT_LOCK_FILENAME), **kwargs)
+
+    def append(self, records: list) -> None:
+        lines = [json.dumps(record, default=_json_default).encode() + b"\n" for record in records]
+        with self._lock:
+            self._buffer.extend(lines)
+            self._segment_rows += len(lines)
+            if self._fsync_interval <= 0:
+                self._flush()
+        if self._segment_rows >= self._compact_rows and self._fsync_interval <= 0:
+            self.compact()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        self._file.write(b"".join(self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self._fsync_interval):
+            self.flush()
+            if self._segment_rows >= self._compact_rows or self._deferred_folds:
+                self.compact()
+
+    def replay(self) -> pd.DataFrame:
+        self.flush()
+        with self._compaction_lock(shared=True), self._tail_lock:
+            last, folded = self._snapshot_state()
+            frames = [read_frame(os.path.join(self._directory, _SNAPSHOT_DIRNAME))] if folded else []
+            for segment in self._segments():
+                if segment in folded:
+                    continue
+                if segment in self._own_segments:
+                    frames.append(_read_segment(self._segment_path(segment))[0])
+                    continue
+                if segment in self._readers:
+                    self._readers.pop(segment)[0].close()
+                frames.append(self._read_new_lines(segment))
+        frames = [frame for frame in frames if frame is not None and frame.shape[0]]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _read_new_lines(self, segment: int) -> pd.DataFrame | None:
+        if segment in self._own_segments:
+            return None
+        if segment not in self._readers:
+            try:
+                self._readers[segment] = (open(self._segment_path(segment), "rb"), 0)
+            except FileNotFoundError:
+                return None
+        file, offset = self._readers[segment]
+        frame, offset, _ = _read_lines(file, offset)
+        self._readers[segment] = (file, offset)
+        return frame
+
+    def tail(self) -> pd.DataFrame:
+        with self._compaction_lock(shared=True), self._tail_lock:
+            segments = set(self._segments())
+            _, folded = self._snapshot_state()
+            frames = [
+                self._read_new_lines(segment)
+                for segment in sorted(segments | set(self._readers))
+                if segment in self._readers or segment not in folded
+            ]
+            for segment in list(self._readers):
+                if segment not in segments:
+                    self._readers.pop(segment)[0].close()
+        frames = [frame for frame in frames if frame is not None and frame.shape[0]]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def follow(self, listener, interval: float = 0.5, *, lock=None) -> None:
+        def follow_periodically():
+            while not self._closed.wait(interval):
+                with lock or contextlib.nullcontext():
+                    rows = self.tail()
+                    if rows.shape[0]:
+                        listener(rows)
+
+        self._start_thread(follow_periodically, "wal-follower")
+
+    def _is_idle(self, segment: int) -> bool:
+        try:
+            return time.time() - os.stat(self._segment_path(segment)).st_mtime >= self._fold_delay
+        except FileNotFoundError:
+            return False
+
+    def compact(self) -> None:
+        with self._compact_lock:
+            with self._lock:
+                self._flush()
+                if self._segment_rows >= self._compact_rows:
+                    self._file.close()
+                    self._segment, self._file = self._open_segment()
+                    self._segment_rows = 0
+                active = self._segment
+
+            with self._compaction_lock(blocking=False) as acquired:
+                if not acquired:
+                    self._deferred_folds = max(self._deferred_folds, 1)
+                    return
+                last, folded = self._snapshot_state()
+                segments = self._segments()
+                for segment in segments:
+                    if segment in folded:
+                        os.remove(self._segment_path(segment))
+                closed = [
+                    segment for segment in segments
+                    if segment not in folded and segment != active and not is_locked(self._segment_path(segment))
+                ]
+                sealed = [segment for segment in closed if self._is_idle(segment)]
+                self._deferred_folds = len(closed) - len(sealed)
+                for segment in sealed:
+                    if not os.path.getsize(self._segment_path(segment)):
+                        os.remove(self._segment_path(segment))
+                sealed = [segment for segment in sealed if os.path.exists(self._segment_path(segment))]
+                if not sealed:
+                    return
+
+                snapshot_directory = os.path.join(self._directory, _SNAPSHOT_DIRNAME)
+                frames = [read_frame(snapshot_directory)] if folded else []
+                for segment in sealed:
+                    frame, _, rejected = _read_segment(self._segment_path(segment))
+                    frames.append(frame)
+                    if rejected:
+                        self._quarantine(rejected)
+                frames = [frame for frame in frames if frame is not None and frame.shape[0]]
+                key = json.dumps({"last": max([last] + sealed), "segments": sealed})
+                write_frame(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(), snapshot_directory, key=key)
+                _fsync_tree(snapshot_directory)
+                _fsync_directory(self._directory)
+
+                for segment in sealed:
+                    os.remove(self._segment_path(segment))
+
+    def _quarantine(self, lines: list) -> None:
+        with open(os.path.join(self._directory, _REJECTED_FILENAME), "ab") as file:
+            file.writelines(line if line.endswith(b"\n") else line + b"\n" for line in lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self) -> None:
+        self._closed.set()
+        for thread in self._threads:
+            thread.join()
+        with self._lock:
+            self._flush()
+            self._file.close()
+        with self._tail_lock:
+            for file, _ in self._readers.values():
+                file.close()
+            self._readers.clear()
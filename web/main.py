@@ -1,28 +1,32 @@
-import httpx
 import os
 import pandas as pd
 import streamlit as st
 import plotly.express as px
-import requests
-
-from scipy.stats import ttest_ind, mannwhitneyu
 
 from utils.graphs import *
 from utils.api_requests import *
 
 st.set_page_config(page_title="Covid-19 Data Analysis")
 
-data = get_all_data("http://127.0.0.1:1234", "2010-01-01", "2025-01-01")
-nans = get_nans_data("http://127.0.0.1:1234")
-pies_data = get_pies_data("http://127.0.0.1:1234")
-
-data.date = pd.to_datetime(data.date)
-data[NUM_COLUMNS] = data[NUM_COLUMNS].apply(pd.to_numeric, axis=1)
-
-deaths_by_years = data.groupby("year").deaths_by_cases.mean()
-data_by_month = data.groupby("month")[NUM_COLUMNS].mean()
-data_by_year = data.groupby("year")[NUM_COLUMNS].mean()
-geo_data = data.loc[data.date.apply(lambda x: x.year == 2022 and x.month == 12 and x.day == 31)]
+with st.spinner("Waiting for the API to finish loading data..."):
+    wait_until_ready(API_ADDRESS)
+
+(
+    data, description, correlation, geo_data, nans, pies_data, continents, deaths_by_years, data_by_month, data_by_year,
+    hypothesis
+) = gather(
+    lambda: get_data_preview(API_ADDRESS, "2010-01-01", "2025-01-01"),
+    lambda: get_describe(API_ADDRESS),
+    lambda: get_correlations(API_ADDRESS),
+    lambda: get_snapshot(API_ADDRESS, "2022-12-31", exact=True),
+    lambda: get_nans_data(API_ADDRESS),
+    lambda: get_pies_data(API_ADDRESS),
+    lambda: get_aggregate(API_ADDRESS, ["continent"], ["total_cases"], ["count"]),
+    lambda: get_aggregate(API_ADDRESS, ["year"], ["deaths_by_cases"]).deaths_by_cases,
+    lambda: get_aggregate(API_ADDRESS, ["month"], NUM_COLUMNS),
+    lambda: get_aggregate(API_ADDRESS, ["year"], NUM_COLUMNS),
+    lambda: get_gdp_hypothesis(API_ADDRESS)["total_deaths_per_million"],
+)
 
 st.title('Covid-19 Data Analysis')
 st.write('This is a simple dashboard to analyze Covid-19 data.')
@@ -51,7 +55,7 @@ st.text(
     "and the extended historical perspective offered by Kaggle's dataset. "
     "This ensures robustness and comprehensiveness in the study of GDP-related trends."
 )
-st.dataframe(data.describe())
+st.dataframe(description)
 
 st.text(
     "The dataset includes 254,420 records spanning from January 5, 2020, to December 31, 2022. "
@@ -201,8 +205,9 @@ st.text(
 )
 st.plotly_chart(
     px.pie(
-        data,
-        names="continent",
+        continents,
+        names=continents.index,
+        values="total_cases",
         title="Distribution of Covid Data by Continents"
     )
 )
@@ -293,7 +298,7 @@ st.text(
 )
 
 st.plotly_chart(
-    corr(data)
+    corr(correlation)
 )
 st.text(
     "The variable gdp shows a moderate positive correlation with total_deaths and total_cases. "
@@ -314,44 +319,23 @@ st.text(
     "people due to better access to healthcare services and more effective pandemic control "
     "measures."
 )
-data_test = data.loc[(data.new_deaths != 0) & (data.total_deaths_per_million != 0)]
-data_test = data_test.dropna(subset=['total_deaths_per_million', 'gdp']).copy()
-data_test = data_test.drop_duplicates(subset=['iso_code', 'date']).copy()
-data_test = data_test.sort_values(by=['iso_code', 'date']).copy()
-
-data_test['gdp_group'] = pd.qcut(data_test['gdp'], q=3, labels=['Low', 'Medium', 'High'])
-
-data_test['spread_rate_per_million'] = data_test.groupby('iso_code')['total_deaths_per_million'].diff()
-data_test = data_test[data_test['spread_rate_per_million'] > 0].copy()
-
-spread_rates = data_test.groupby('gdp_group')['spread_rate_per_million'].mean()
+spread_rates = pd.DataFrame(hypothesis["groups"]).rename(columns={
+    "group": "gdp_group", "mean": "spread_rate_per_million"
+})[["gdp_group", "spread_rate_per_million"]]
 st.text("Average spread rate per million for GDP groups:")
 
-st.dataframe(spread_rates.reset_index())
-
-low = data_test[data_test['gdp_group'] == 'Low']['spread_rate_per_million'].dropna()
-medium = data_test[data_test['gdp_group'] == 'Medium']['spread_rate_per_million'].dropna()
-high = data_test[data_test['gdp_group'] == 'High']['spread_rate_per_million'].dropna()
+st.dataframe(spread_rates)
 
 st.text("Pairwise T-tests:")
-t_stat_low_medium, p_value_low_medium = ttest_ind(low, medium, equal_var=False)
-st.text(f"Low vs. Medium: t_stat = {t_stat_low_medium}, p_value = {p_value_low_medium}")
-
-t_stat_medium_high, p_value_medium_high = ttest_ind(medium, high, equal_var=False)
-st.text(f"Medium vs. High: t_stat = {t_stat_medium_high}, p_value = {p_value_medium_high}")
-
-t_stat_low_high, p_value_low_high = ttest_ind(low, high, equal_var=False)
-st.text(f"Low vs. High: t_stat = {t_stat_low_high}, p_value = {p_value_low_high}")
+for pair in hypothesis["pairs"]:
+    st.text(f"{pair['a']} vs. {pair['b']}: t_stat = {pair['ttest']['statistic']}, p_value = {pair['ttest']['pvalue']}")
 
 st.text("Pairwise Mann-Whitney U-tests:")
-u_stat_low_medium, p_value_u_low_medium = mannwhitneyu(low, medium, alternative='two-sided')
-st.text(f"Low vs. Medium: u_stat = {u_stat_low_medium}, p_value = {p_value_u_low_medium}")
-
-u_stat_medium_high, p_value_u_medium_high = mannwhitneyu(medium, high, alternative='two-sided')
-st.text(f"Medium vs. High: u_stat = {u_stat_medium_high}, p_value = {p_value_u_medium_high}")
-
-u_stat_low_high, p_value_u_low_high = mannwhitneyu(low, high, alternative='two-sided')
-st.text(f"Low vs. High: u_stat = {u_stat_low_high}, p_value = {p_value_u_low_high}")
+for pair in hypothesis["pairs"]:
+    st.text(
+        f"{pair['a']} vs. {pair['b']}: u_stat = {pair['mannwhitneyu']['statistic']}, "
+        f"p_value = {pair['mannwhitneyu']['pvalue']}"
+    )
 
 st.text(
     "The hypothesis that the COVID-19 mortality rate per million people depends on a "
@@ -401,7 +385,7 @@ if submitted:
     }
 
     try:
-        response = requests.post("http://127.0.0.1:8000/api/v1/data", json=payload)
+        response = post_data(API_ADDRESS, payload)
 
         if response.status_code == 200:
             st.success("Data successfully submitted!")
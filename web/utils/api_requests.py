@@ -1,22 +1,354 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
 import httpx
+import numpy as np
 import pandas as pd
 
-__all__ = ("get_all_data", "get_nans_data", "get_pies_data")
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+__all__ = (
+    "API_ADDRESS",
+    "get_all_data",
+    "iter_all_data",
+    "get_data_preview",
+    "get_aggregate",
+    "get_describe",
+    "get_correlations",
+    "get_gdp_hypothesis",
+    "get_nans_data",
+    "get_pies_data",
+    "get_snapshot",
+    "post_data",
+    "wait_until_ready",
+    "gather"
+)
+
+API_ADDRESS = os.environ.get("api_address", "http://127.0.0.1:1234")
+
+_ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+_PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+_SPLIT_MEDIA_TYPE = "application/vnd.pandas.split+json"
+_NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_STRING_COLUMNS = ("iso_code", "continent", "location")
+
+_RETRY_STATUSES = (502, 503, 504)
+
+_cache = {}
+_client = None
+_client_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="api-request")
+
+
+def _get_client() -> httpx.Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            timeout = float(os.environ.get("api_timeout", "30"))
+            _client = httpx.Client(
+                timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+                transport=httpx.HTTPTransport(
+                    http2=h2 is not None, limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+                ),
+            )
+        return _client
+
+
+def _send(method: str, url: str, *, stream: bool = False, **kwargs) -> httpx.Response:
+    retries = int(os.environ.get("api_retries", "3"))
+    backoff = float(os.environ.get("api_backoff", "0.5"))
+    client = _get_client()
+    for attempt in range(retries + 1):
+        try:
+            response = client.send(client.build_request(method, url, **kwargs), stream=stream)
+        except httpx.TransportError:
+            if method != "GET" or attempt == retries:
+                raise
+        else:
+            if method != "GET" or response.status_code not in _RETRY_STATUSES or attempt == retries:
+                return response
+            response.close()
+            delay = response.headers.get("retry-after", "")
+            if delay.isdigit():
+                time.sleep(float(delay))
+                continue
+        time.sleep(backoff * 2 ** attempt)
+
+
+def _request(method: str, url: str, **kwargs) -> httpx.Response:
+    return _send(method, url, **kwargs)
+
+
+@contextlib.contextmanager
+def _stream(method: str, url: str, **kwargs):
+    response = _send(method, url, stream=True, **kwargs)
+    try:
+        yield response
+    finally:
+        response.close()
+
+
+def wait_until_ready(address: str, *, timeout: float = None, interval: float = 1.0) -> dict:
+    if timeout is None:
+        timeout = float(os.environ.get("api_ready_timeout", "300"))
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = _get_client().get(address + "/readyz")
+        except httpx.TransportError:
+            response = None
+        if response is not None:
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 503 and response.json().get("status") == "failed":
+                raise RuntimeError(f"The API failed to load its data: {response.json().get('error')}")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"The API at {address} was not ready after {timeout:g}s")
+        time.sleep(interval)
+
+
+def gather(*calls) -> list:
+    return [future.result() for future in [_executor.submit(call) for call in calls]]
+
+
+class _ResponseStream(io.RawIOBase):
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.iter_bytes()
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _accept_header(stream: bool = False) -> str:
+    if stream and pa is None:
+        return f"{_NDJSON_MEDIA_TYPE}, application/json;q=0.5"
+    if stream:
+        return f"{_ARROW_MEDIA_TYPE}, {_NDJSON_MEDIA_TYPE};q=0.9, application/json;q=0.5"
+    if pa is None:
+        return f"{_SPLIT_MEDIA_TYPE}, application/json;q=0.5"
+    return f"{_ARROW_MEDIA_TYPE}, {_SPLIT_MEDIA_TYPE};q=0.9, application/json;q=0.5"
+
+
+def _media_type(response: httpx.Response) -> str:
+    return response.headers.get("content-type", "").split(";")[0].strip()
+
+
+def _to_plain_dtypes(frame: pd.DataFrame) -> pd.DataFrame:
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype(object)
+        elif pd.api.types.is_extension_array_dtype(frame[column].dtype) and pd.api.types.is_numeric_dtype(frame[column].dtype):
+            frame[column] = frame[column].astype("float64")
+    return frame
+
 
+def _decode_frame(response: httpx.Response) -> pd.DataFrame:
+    media_type = _media_type(response)
+    if media_type == _ARROW_MEDIA_TYPE:
+        return _to_plain_dtypes(pa.ipc.open_stream(response.content).read_pandas())
+    if media_type == _PARQUET_MEDIA_TYPE:
+        return _to_plain_dtypes(pd.read_parquet(io.BytesIO(response.content)))
+    if media_type == _SPLIT_MEDIA_TYPE:
+        return pd.read_json(io.StringIO(response.text), orient="split", convert_dates=["date"])
+    frame = pd.DataFrame.from_dict(response.json())
+    frame.date = pd.to_datetime(frame.date)
+    for column in frame.columns.difference(_STRING_COLUMNS + ("date",)):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return frame
 
-def get_all_data(address: str, start_date: str, end_date: str):
-    return pd.DataFrame.from_dict(
-        httpx.get(
-            address + "/api/v1/data", params={
-                "start_datetime": start_date,
-                "end_datetime": end_date
-            }, timeout=30
-        ).json()
+
+def _iter_ndjson(response: httpx.Response, chunk_rows: int):
+    lines = []
+    for line in response.iter_lines():
+        if line:
+            lines.append(line)
+        if len(lines) >= chunk_rows:
+            yield pd.read_json(io.StringIO("\n".join(lines)), lines=True, convert_dates=["date"])
+            lines = []
+    if lines:
+        yield pd.read_json(io.StringIO("\n".join(lines)), lines=True, convert_dates=["date"])
+
+
+def _stream_data(
+    address: str,
+    start_date: str,
+    end_date: str,
+    *,
+    chunk_rows: int,
+    etag: str = None,
+    columns: list = None,
+    iso_codes: list = None,
+    continents: list = None
+):
+    params = {
+        "start_datetime": start_date,
+        "end_datetime": end_date,
+        "stream": True,
+        "chunk_rows": chunk_rows
+    }
+    for name, values in (("columns", columns), ("iso_code", iso_codes), ("continent", continents)):
+        if values:
+            params[name] = list(values)
+    headers = {"Accept": _accept_header(stream=True)}
+    if etag is not None:
+        params["since"] = etag.removeprefix("W/").strip('"')
+        headers["If-None-Match"] = etag
+    return _stream("GET", address + "/api/v1/data", params=params, headers=headers)
+
+
+def _iter_frames(response: httpx.Response, chunk_rows: int):
+    media_type = _media_type(response)
+    if media_type == _ARROW_MEDIA_TYPE:
+        reader = pa.ipc.open_stream(io.BufferedReader(_ResponseStream(response)))
+        empty = True
+        for batch in reader:
+            empty = False
+            yield _to_plain_dtypes(batch.to_pandas())
+        if empty:
+            yield _to_plain_dtypes(reader.schema.empty_table().to_pandas())
+    elif media_type == _NDJSON_MEDIA_TYPE:
+        yield from _iter_ndjson(response, chunk_rows)
+    else:
+        response.read()
+        yield _decode_frame(response)
+
+
+def iter_all_data(address: str, start_date: str, end_date: str, *, chunk_rows: int = 50_000, **filters):
+    with _stream_data(address, start_date, end_date, chunk_rows=chunk_rows, **filters) as response:
+        response.raise_for_status()
+        yield from _iter_frames(response, chunk_rows)
+
+
+def get_all_data(address: str, start_date: str, end_date: str, *, chunk_rows: int = 50_000, **filters):
+    key = ("data", address, start_date, end_date, json.dumps(filters, sort_keys=True))
+    etag, cached = _cache.get(key, (None, None))
+    with _stream_data(address, start_date, end_date, chunk_rows=chunk_rows, etag=etag, **filters) as response:
+        if response.status_code == 304:
+            return cached.copy()
+        response.raise_for_status()
+        frames = list(_iter_frames(response, chunk_rows))
+        data = pd.concat(frames) if frames else pd.DataFrame()
+        if cached is not None and "x-delta-since" in response.headers:
+            data = pd.concat([cached, data]) if data.shape[0] else cached
+            if "date" in data.columns:
+                data = data.take(np.argsort(data.date.to_numpy(), kind="stable"))
+        if "etag" in response.headers:
+            _cache[key] = (response.headers["etag"], data)
+    return data.copy()
+
+
+def _get_cached(address: str, path: str, decode, params: dict = None, headers: dict = None):
+    key = (path, address, json.dumps(params, sort_keys=True))
+    etag, cached = _cache.get(key, (None, None))
+    headers = dict(headers or {})
+    if etag is not None:
+        headers["If-None-Match"] = etag
+    response = _request("GET", address + path, params=params, headers=headers)
+    if response.status_code == 304:
+        return copy.deepcopy(cached)
+    response.raise_for_status()
+    value = decode(response)
+    if "etag" in response.headers:
+        _cache[key] = (response.headers["etag"], value)
+    return copy.deepcopy(value)
+
+
+def get_aggregate(address: str, by: list, metrics: list, reducers: list = ("mean",)):
+    return _get_cached(
+        address,
+        "/api/v1/aggregate",
+        lambda response: pd.read_json(io.StringIO(response.text), orient="split").set_index(list(by)),
+        params={
+            "by": list(by),
+            "metrics": list(metrics),
+            "reducers": list(reducers)
+        }
     )
 
 
+def _decode_describe(response: httpx.Response) -> pd.DataFrame:
+    frame = pd.read_json(io.StringIO(response.text), orient="split", convert_dates=False)
+    if "date" in frame.columns:
+        stats = frame.index != "count"
+        frame["date"] = frame.date.astype(object)
+        frame.loc[stats, "date"] = pd.to_datetime(frame.date[stats], errors="coerce")
+    return frame
+
+
+def get_describe(address: str) -> pd.DataFrame:
+    return _get_cached(address, "/api/v1/describe", _decode_describe)
+
+
+def get_correlations(address: str) -> pd.DataFrame:
+    return _get_cached(
+        address,
+        "/api/v1/correlations",
+        lambda response: pd.read_json(io.StringIO(response.text), orient="split")
+    )
+
+
+def get_data_preview(address: str, start_date: str, end_date: str, *, limit: int = 1000) -> pd.DataFrame:
+    return _get_cached(
+        address,
+        "/api/v1/data",
+        _decode_frame,
+        params={"start_datetime": start_date, "end_datetime": end_date, "limit": limit},
+        headers={"Accept": _accept_header()}
+    )
+
+
+def get_gdp_hypothesis(address: str, metrics: list = ("total_deaths_per_million",), q: int = 3):
+    return _get_cached(
+        address,
+        "/api/v1/hypothesis/gdp",
+        httpx.Response.json,
+        params={"metrics": list(metrics), "q": q}
+    )
+
+
+def get_snapshot(address: str, date: str = None, *, exact: bool = False, columns: list = None):
+    params = {"exact": exact}
+    if date is not None:
+        params["date"] = date
+    if columns:
+        params["columns"] = list(columns)
+    return _get_cached(address, "/api/v1/snapshot", _decode_frame, params=params, headers={"Accept": _accept_header()})
+
+
 def get_nans_data(address: str):
-    return httpx.get(address + "/api/v1/nans-counts", timeout=30).json()
+    return _get_cached(address, "/api/v1/nans-counts", httpx.Response.json)
+
 
 def get_pies_data(address: str):
-    return httpx.get(address + "/api/v1/get-pies-data", timeout=30).json()
+    return _get_cached(address, "/api/v1/get-pies-data", httpx.Response.json)
+
+
+def post_data(address: str, payload: dict) -> httpx.Response:
+    return _request("POST", address + "/api/v1/data", json=payload)
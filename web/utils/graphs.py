@@ -3,8 +3,6 @@ import plotly.express as px
 import plotly.graph_objs as go
 import plotly.subplots as sp
 
-from sklearn.preprocessing import LabelEncoder
-
 __all__ = (
     "construct_nans_bar",
     "construct_nans_pies",
@@ -100,11 +98,6 @@ def construct_all_data_hists(data: pd.DataFrame) -> go.Figure:
 
     return subplot
 
-def corr(data: pd.DataFrame):
-    le_location = LabelEncoder()
-    le_continent = LabelEncoder()
-    corr_data = data.copy()
-    corr_data["location"] = le_location.fit_transform(corr_data.location)
-    corr_data["continent"] = le_continent.fit_transform(corr_data.continent)
-    fig = px.imshow(corr_data.drop("iso_code", axis=1).corr())
+def corr(correlation: pd.DataFrame):
+    fig = px.imshow(correlation)
     return fig
\ No newline at end of file